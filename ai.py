@@ -1,12 +1,68 @@
 from flask import Blueprint, request, jsonify
-from src.models.user import db, Conversation, User
+from src.models.user import db, Alert, Conversation, ConversationDailyStats, ResourceVersion, User, UserDataVersion
 from src.routes.auth import verify_token
-from datetime import datetime
+from src.routes.events import publish_alerts, publish_conversations
+from src.routes.metrics import query_budget
+from datetime import datetime, time, timedelta
+from time import monotonic as clock, sleep
+from types import SimpleNamespace
+import click
 import json
 import random
+import re
 
 ai_bp = Blueprint('ai', __name__)
 
+# Tokens are lowercase words, keeping simple contractions such as "can't" intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Inflections accepted after a single-word keyword of at least 4 letters,
+# so "pill" still matches "pills" and "feel" matches "feeling"
+KEYWORD_SUFFIXES = ('s', 'es', 'ed', 'ing')
+
+class KeywordEngine:
+    """Word-level trie over every keyword table, compiled once.
+
+    Each table maps a label to a list of keywords (single words or phrases).
+    `scan` tokenizes the message once and walks the trie from every token,
+    so the cost of a message depends on its length, not on the lexicon size.
+    Matches only happen on whole words: "hill" does not match "ill".
+    """
+
+    def __init__(self, tables):
+        self.root = {}
+        self.max_depth = 0
+        for table, groups in tables.items():
+            for label, keywords in groups.items():
+                for keyword in keywords:
+                    self.add(keyword, table, label)
+
+    def add(self, keyword, table, label):
+        words = TOKEN_PATTERN.findall(keyword.lower())
+        variants = [words]
+        if len(words) == 1 and len(words[0]) >= 4:
+            variants += [[words[0] + suffix] for suffix in KEYWORD_SUFFIXES]
+        for variant in variants:
+            node = self.root
+            for word in variant:
+                node = node.setdefault(word, {})
+            node.setdefault(None, set()).add((table, label, keyword))
+        self.max_depth = max(self.max_depth, len(words))
+
+    def scan(self, message_text):
+        """Return {table: {label: set of matched keywords}} for a message"""
+        tokens = TOKEN_PATTERN.findall(message_text.lower())
+        matches = {}
+        for start in range(len(tokens)):
+            node = self.root
+            for word in tokens[start:start + self.max_depth]:
+                node = node.get(word)
+                if node is None:
+                    break
+                for table, label, keyword in node.get(None, ()):
+                    matches.setdefault(table, {}).setdefault(label, set()).add(keyword)
+        return matches
+
 # AI Personality and Response System
 class ElderCareAI:
     def __init__(self):
@@ -71,49 +127,69 @@ class ElderCareAI:
             "greeting": ["hello", "hi", "good morning", "good afternoon", "good evening"],
             "gratitude": ["thank", "thanks", "appreciate", "grateful"]
         }
-    
-    def analyze_mood(self, message_text):
-        """Analyze the mood of the user's message"""
-        positive_words = ["good", "great", "happy", "wonderful", "excellent", "fine", "okay", "well"]
-        negative_words = ["bad", "sad", "terrible", "awful", "sick", "pain", "hurt", "worried", "lonely"]
         
-        text_lower = message_text.lower()
+        # Keywords for mood and concern detection
+        self.mood_keywords = {
+            "positive": ["good", "great", "happy", "wonderful", "excellent", "fine", "okay", "well"],
+            "negative": ["bad", "sad", "terrible", "awful", "sick", "pain", "hurt", "worried", "lonely"]
+        }
+        self.concern_keywords = [
+            "pain", "hurt", "sick", "emergency", "help", "can't", "unable", 
+            "forgot", "confused", "dizzy", "chest pain", "breathing", "fall", "fell"
+        ]
         
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
+        # Compile all keyword tables once so each message is scanned in a single pass
+        self.keyword_engine = KeywordEngine({
+            "intent": self.intent_keywords,
+            "mood": self.mood_keywords,
+            "concern": {"concern": self.concern_keywords}
+        })
+    
+    def analyze_message(self, message_text):
+        """Classify intent, score mood and detect concerns in one pass over the message"""
+        matches = self.keyword_engine.scan(message_text)
+        
+        intents = matches.get("intent", {})
+        intent = next((name for name in self.intent_keywords if name in intents), "default")
         
+        mood = matches.get("mood", {})
+        positive_count = len(mood.get("positive", ()))
+        negative_count = len(mood.get("negative", ()))
         if positive_count > negative_count:
-            return 8  # Good mood
+            mood_score = 8  # Good mood
         elif negative_count > positive_count:
-            return 4  # Lower mood
+            mood_score = 4  # Lower mood
         else:
-            return 6  # Neutral mood
+            mood_score = 6  # Neutral mood
+        
+        concerns = matches.get("concern", {}).get("concern", set())
+        
+        return {
+            "intent": intent,
+            "mood_score": mood_score,
+            "contains_concern": bool(concerns),
+            "concerns": concerns
+        }
+    
+    def analyze_mood(self, message_text):
+        """Analyze the mood of the user's message"""
+        return self.analyze_message(message_text)["mood_score"]
     
     def detect_concerns(self, message_text):
         """Detect if the message contains concerning content"""
-        concern_keywords = [
-            "pain", "hurt", "sick", "emergency", "help", "can't", "unable", 
-            "forgot", "confused", "dizzy", "chest pain", "breathing", "fall", "fell"
-        ]
-        
-        text_lower = message_text.lower()
-        return any(keyword in text_lower for keyword in concern_keywords)
+        return self.analyze_message(message_text)["contains_concern"]
     
     def classify_intent(self, message_text):
         """Classify the intent of the user's message"""
-        text_lower = message_text.lower()
-        
-        for intent, keywords in self.intent_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return intent
-        
-        return "default"
+        return self.analyze_message(message_text)["intent"]
     
-    def generate_response(self, message_text, user_context=None):
+    def generate_response(self, message_text, user_context=None, analysis=None):
         """Generate an appropriate AI response"""
-        intent = self.classify_intent(message_text)
-        mood_score = self.analyze_mood(message_text)
-        contains_concern = self.detect_concerns(message_text)
+        if analysis is None:
+            analysis = self.analyze_message(message_text)
+        intent = analysis["intent"]
+        mood_score = analysis["mood_score"]
+        contains_concern = analysis["contains_concern"]
         
         # Select appropriate response category
         if intent in self.responses:
@@ -123,7 +199,7 @@ class ElderCareAI:
         
         # Add context-specific responses
         if contains_concern:
-            if "emergency" in message_text.lower() or "help" in message_text.lower():
+            if analysis["concerns"] & {"emergency", "help"}:
                 response_category = "emergency_response"
             else:
                 response_category = "mood_check"
@@ -150,10 +226,26 @@ class ElderCareAI:
             "contains_concern": contains_concern
         }
 
+    def generate_responses(self, messages, user_contexts=None):
+        """Generate responses for a batch of messages, analyzing each distinct text once"""
+        user_contexts = user_contexts or [None] * len(messages)
+        analyses = {}
+        results = []
+        for message_text, user_context in zip(messages, user_contexts):
+            if message_text not in analyses:
+                analyses[message_text] = self.analyze_message(message_text)
+            results.append(self.generate_response(
+                message_text,
+                user_context=user_context,
+                analysis=analyses[message_text]
+            ))
+        return results
+
 # Initialize AI instance
 elder_care_ai = ElderCareAI()
 
 @ai_bp.route('/ai/chat', methods=['POST'])
+@query_budget(10)
 def ai_chat():
     try:
         token = request.headers.get('Authorization')
@@ -194,8 +286,14 @@ def ai_chat():
             contains_concern=ai_result['contains_concern']
         )
         db.session.add(ai_conversation)
+        ConversationDailyStats.record([user_conversation, ai_conversation])
+        UserDataVersion.bump([user.id])
+        ResourceVersion.bump('conversations', [user.id])
+        alerts = Alert.evaluate_conversations([user_conversation, ai_conversation])
         
         db.session.commit()
+        publish_conversations([user_conversation])
+        publish_alerts(alerts)
         
         return jsonify({
             'response': ai_result['response'],
@@ -208,7 +306,116 @@ def ai_chat():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Upper bound on messages accepted by a single batch request
+MAX_CHAT_BATCH_SIZE = 500
+
+@ai_bp.route('/ai/chat/batch', methods=['POST'])
+@query_budget(11)
+def ai_chat_batch():
+    """Process queued messages, possibly for several elders, in one request and one transaction
+    
+    Expected payload:
+    {
+        "messages": [
+            {"message": "Good morning", "user_id": 1},
+            {"message": "I took my pills"}
+        ]
+    }
+    `user_id` defaults to the caller; other users must be elders the caller cares for.
+    Results are returned in the same order as the messages.
+    """
+    try:
+        token = request.headers.get('Authorization')
+        user = verify_token(token) if token else None
+        
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        data = request.get_json()
+        messages = data.get('messages') if isinstance(data, dict) else None
+        
+        if not isinstance(messages, list) or not messages:
+            return jsonify({'error': 'messages must be a non-empty list'}), 400
+        
+        if len(messages) > MAX_CHAT_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_CHAT_BATCH_SIZE} messages per batch'}), 400
+        
+        # Validate every entry before touching the database
+        for index, item in enumerate(messages):
+            if not isinstance(item, dict) or not isinstance(item.get('message'), str):
+                return jsonify({'error': f'messages[{index}].message is required'}), 400
+            user_id = item.get('user_id', user.id)
+            if not isinstance(user_id, int) or isinstance(user_id, bool):
+                return jsonify({'error': f'messages[{index}].user_id must be an integer'}), 400
+        
+        # Resolve every target user in one query
+        target_ids = {item.get('user_id', user.id) for item in messages}
+        targets = {target.id: target for target in User.query.filter(User.id.in_(target_ids)).all()}
+        
+        results = [None] * len(messages)
+        accepted = []
+        for index, item in enumerate(messages):
+            target = targets.get(item.get('user_id', user.id))
+            if not target:
+                results[index] = {'error': 'User not found'}
+            elif target.id != user.id and target.caregiver_id != user.id:
+                results[index] = {'error': 'Access denied'}
+            else:
+                accepted.append((index, target, item['message']))
+        
+        # Analyze the accepted messages as one batch
+        ai_results = elder_care_ai.generate_responses(
+            [message for _, _, message in accepted],
+            user_contexts=[{'full_name': target.full_name} for _, target, _ in accepted]
+        )
+        
+        # Save user messages and AI responses in one transaction
+        rows = []
+        for (index, target, message), ai_result in zip(accepted, ai_results):
+            for text, message_type in ((message, 'user'), (ai_result['response'], 'ai')):
+                rows.append(Conversation(
+                    user_id=target.id,
+                    message_text=text,
+                    message_type=message_type,
+                    mood_score=ai_result['mood_score'],
+                    contains_concern=ai_result['contains_concern']
+                ))
+        db.session.add_all(rows)
+        ConversationDailyStats.record(rows)
+        UserDataVersion.bump([row.user_id for row in rows])
+        ResourceVersion.bump('conversations', [row.user_id for row in rows])
+        alerts = Alert.evaluate_conversations(rows)
+        db.session.flush()
+        # Publishing and the results read every row after the commit; detached rows
+        # keep their flushed values instead of each being reloaded
+        for instance in rows + alerts:
+            db.session.expunge(instance)
+        db.session.commit()
+        publish_conversations(rows)
+        publish_alerts(alerts)
+        
+        for position, ((index, target, _), ai_result) in enumerate(zip(accepted, ai_results)):
+            results[index] = {
+                'user_id': target.id,
+                'response': ai_result['response'],
+                'intent': ai_result['intent'],
+                'mood_score': ai_result['mood_score'],
+                'contains_concern': ai_result['contains_concern'],
+                'conversation_id': rows[2 * position + 1].id
+            }
+        
+        return jsonify({
+            'results': results,
+            'processed': len(accepted),
+            'failed': len(messages) - len(accepted)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @ai_bp.route('/ai/mood-analysis/<int:user_id>', methods=['GET'])
+@query_budget(2)
 def get_mood_analysis(user_id):
     try:
         token = request.headers.get('Authorization')
@@ -221,20 +428,18 @@ def get_mood_analysis(user_id):
         if user.id != user_id and user.caregiver_id != user.id:
             return jsonify({'error': 'Access denied'}), 403
         
-        # Get date range
+        # Get date range, in whole days so it can be answered from the daily rollup
         days = request.args.get('days', 7, type=int)
         end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
+        start_date = datetime.combine((end_date - timedelta(days=days)).date(), time.min)
         
-        # Get conversations with mood scores
-        conversations = Conversation.query.filter(
-            Conversation.user_id == user_id,
-            Conversation.timestamp >= start_date,
-            Conversation.timestamp <= end_date,
-            Conversation.mood_score.isnot(None)
-        ).order_by(Conversation.timestamp).all()
+        # Get daily mood totals
+        stats = [
+            s for s in ConversationDailyStats.for_window(user_id, start_date.date(), end_date.date())
+            if s.mood_count
+        ]
         
-        if not conversations:
+        if not stats:
             return jsonify({
                 'mood_analysis': {
                     'average_mood': None,
@@ -244,15 +449,24 @@ def get_mood_analysis(user_id):
                 }
             }), 200
         
+        # Collapse message types into one (mood_sum, mood_count) per day
+        daily = {}
+        for s in stats:
+            totals = daily.setdefault(s.day, [0, 0])
+            totals[0] += s.mood_sum
+            totals[1] += s.mood_count
+        daily = [daily[day] for day in sorted(daily)]
+        
         # Calculate mood statistics
-        mood_scores = [conv.mood_score for conv in conversations]
-        average_mood = sum(mood_scores) / len(mood_scores)
+        total_conversations = sum(count for _, count in daily)
+        average_mood = sum(mood_sum for mood_sum, _ in daily) / total_conversations
         
-        # Calculate trend (simple: compare first half vs second half)
-        mid_point = len(mood_scores) // 2
+        # Calculate trend (simple: compare first half of the days vs second half)
+        mid_point = len(daily) // 2
         if mid_point > 0:
-            first_half_avg = sum(mood_scores[:mid_point]) / mid_point
-            second_half_avg = sum(mood_scores[mid_point:]) / (len(mood_scores) - mid_point)
+            first_half, second_half = daily[:mid_point], daily[mid_point:]
+            first_half_avg = sum(m for m, _ in first_half) / sum(c for _, c in first_half)
+            second_half_avg = sum(m for m, _ in second_half) / sum(c for _, c in second_half)
             
             if second_half_avg > first_half_avg + 0.5:
                 trend = 'improving'
@@ -264,13 +478,13 @@ def get_mood_analysis(user_id):
             trend = 'stable'
         
         # Count concerns
-        concerns_count = len([conv for conv in conversations if conv.contains_concern])
+        concerns_count = sum(s.concern_count for s in stats)
         
         return jsonify({
             'mood_analysis': {
                 'average_mood': round(average_mood, 1),
                 'mood_trend': trend,
-                'total_conversations': len(conversations),
+                'total_conversations': total_conversations,
                 'concerns_count': concerns_count,
                 'date_range': {
                     'start': start_date.isoformat(),
@@ -282,7 +496,16 @@ def get_mood_analysis(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+CHECK_IN_MESSAGES = [
+    "Good morning! How are you feeling today? I'm here if you need anything.",
+    "I hope you're having a good day! Don't forget to take your medications if you haven't already.",
+    "Just checking in on you. How has your day been so far?",
+    "I wanted to see how you're doing. Is there anything I can help you with today?",
+    "Good afternoon! Have you been staying hydrated and taking care of yourself?"
+]
+
 @ai_bp.route('/ai/proactive-check', methods=['POST'])
+@query_budget(6)
 def proactive_check():
     """Generate proactive check-in messages for users"""
     try:
@@ -293,23 +516,18 @@ def proactive_check():
             return jsonify({'error': 'Authentication required'}), 401
         
         # Generate a proactive check-in message
-        check_in_messages = [
-            "Good morning! How are you feeling today? I'm here if you need anything.",
-            "I hope you're having a good day! Don't forget to take your medications if you haven't already.",
-            "Just checking in on you. How has your day been so far?",
-            "I wanted to see how you're doing. Is there anything I can help you with today?",
-            "Good afternoon! Have you been staying hydrated and taking care of yourself?"
-        ]
+        message = random.choice(CHECK_IN_MESSAGES)
         
-        message = random.choice(check_in_messages)
-        
-        # Save proactive message to database
+        # Save proactive message to database; the 'checkin' type lets the batch job skip users already checked in today
         proactive_conversation = Conversation(
             user_id=user.id,
             message_text=message,
-            message_type='ai'
+            message_type='checkin'
         )
         db.session.add(proactive_conversation)
+        ConversationDailyStats.record([proactive_conversation])
+        UserDataVersion.bump([user.id])
+        ResourceVersion.bump('conversations', [user.id])
         db.session.commit()
         
         return jsonify({
@@ -321,7 +539,71 @@ def proactive_check():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def elders_due_check_in(now, idle_hours):
+    """Ids of elders with no message of their own in the last idle_hours and no check-in today, in one query"""
+    recent_message = db.select(Conversation.id).where(
+        Conversation.user_id == User.id,
+        Conversation.message_type == 'user',
+        Conversation.timestamp >= now - timedelta(hours=idle_hours)
+    ).exists()
+    checked_in_today = db.select(ConversationDailyStats.user_id).where(
+        ConversationDailyStats.user_id == User.id,
+        ConversationDailyStats.day == now.date(),
+        ConversationDailyStats.message_type == 'checkin'
+    ).exists()
+    return db.session.scalars(
+        db.select(User.id).where(User.is_elder == True, ~recent_message, ~checked_in_today).order_by(User.id)
+    ).all()
+
+def send_check_ins(idle_hours=12, rate=5000, batch_size=1000, now=None):
+    """Write a check-in message for every eligible elder; returns how many were sent
+    
+    Rows go in with one executemany and one commit per batch, and batches
+    are paced to at most `rate` messages per second (0 for no limit) so the
+    job doesn't starve interactive writers of the database.
+    """
+    now = now or datetime.utcnow()
+    elder_ids = elders_due_check_in(now, idle_hours)
+    
+    sent = 0
+    started = clock()
+    for offset in range(0, len(elder_ids), batch_size):
+        rows = [
+            {
+                'user_id': elder_id,
+                'message_text': random.choice(CHECK_IN_MESSAGES),
+                'message_type': 'checkin',
+                'timestamp': now,
+                'mood_score': None,
+                'contains_concern': False
+            }
+            for elder_id in elder_ids[offset:offset + batch_size]
+        ]
+        db.session.execute(db.insert(Conversation), rows)
+        # The rollup only reads attributes, so skip building ORM instances
+        ConversationDailyStats.record([SimpleNamespace(**row) for row in rows])
+        UserDataVersion.bump([row['user_id'] for row in rows])
+        ResourceVersion.bump('conversations', [row['user_id'] for row in rows])
+        db.session.commit()
+        sent += len(rows)
+        
+        if rate:
+            ahead = sent / rate - (clock() - started)
+            if ahead > 0:
+                sleep(ahead)
+    return sent
+
+@ai_bp.cli.command('check-in')
+@click.option('--idle-hours', type=int, default=12, help='Skip elders who wrote within this many hours')
+@click.option('--rate', type=int, default=5000, help='Maximum check-ins per second (0 for no limit)')
+@click.option('--batch-size', type=int, default=1000, help='Check-ins written per transaction')
+def check_in_command(idle_hours, rate, batch_size):
+    """Send a proactive check-in to every elder who needs one; run daily, e.g. each morning"""
+    sent = send_check_ins(idle_hours=idle_hours, rate=rate, batch_size=batch_size)
+    click.echo(f'{sent} check-in(s) sent')
+
 @ai_bp.route('/ai/transcribe', methods=['POST'])
+@query_budget(1)
 def transcribe_audio():
     """Simulate voice-to-text transcription"""
     try:
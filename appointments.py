@@ -1,11 +1,16 @@
 from flask import Blueprint, request, jsonify
-from src.models.user import db, Appointment
+from src.models.user import db, Alert, Appointment, ResourceVersion, UserDataVersion
 from src.routes.auth import verify_token
+from src.routes.conditional import is_not_modified, list_validators, not_modified, with_validators
+from src.routes.serialization import json_response, appointment_rows
+from src.routes.events import publish_alerts
+from src.routes.metrics import query_budget
 from datetime import datetime, date, timedelta
 
 appointments_bp = Blueprint('appointments', __name__)
 
 @appointments_bp.route('/appointments/<int:user_id>', methods=['GET'])
+@query_budget(3)
 def get_appointments(user_id):
     try:
         token = request.headers.get('Authorization')
@@ -22,6 +27,11 @@ def get_appointments(user_id):
         status = request.args.get('status')
         upcoming_only = request.args.get('upcoming', 'false').lower() == 'true'
         
+        # Answer conditional requests from the version counter, before loading any rows
+        etag, last_modified = list_validators('appointments', user_id, vary=date.today() if upcoming_only else None)
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+        
         query = Appointment.query.filter_by(user_id=user_id)
         
         if status:
@@ -30,16 +40,18 @@ def get_appointments(user_id):
         if upcoming_only:
             query = query.filter(Appointment.appointment_date >= date.today())
         
-        appointments = query.order_by(Appointment.appointment_date, Appointment.appointment_time).all()
+        appointments = query.order_by(Appointment.appointment_date, Appointment.appointment_time)\
+            .with_entities(*appointment_rows.columns).all()
         
-        return jsonify({
-            'appointments': [apt.to_dict() for apt in appointments]
-        }), 200
+        return with_validators(json_response({
+            'appointments': appointment_rows.to_dicts(appointments)
+        }), etag, last_modified), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @appointments_bp.route('/appointments', methods=['POST'])
+@query_budget(8)
 def create_appointment():
     try:
         token = request.headers.get('Authorization')
@@ -68,7 +80,12 @@ def create_appointment():
         )
         
         db.session.add(appointment)
+        db.session.flush()
+        UserDataVersion.bump([appointment.user_id])
+        ResourceVersion.bump('appointments', [appointment.user_id])
+        alerts = Alert.evaluate_appointment(appointment)
         db.session.commit()
+        publish_alerts(alerts)
         
         return jsonify({
             'message': 'Appointment created successfully',
@@ -79,6 +96,7 @@ def create_appointment():
         return jsonify({'error': str(e)}), 500
 
 @appointments_bp.route('/appointments/<int:appointment_id>', methods=['PUT'])
+@query_budget(9)
 def update_appointment(appointment_id):
     try:
         token = request.headers.get('Authorization')
@@ -115,7 +133,16 @@ def update_appointment(appointment_id):
         if 'status' in data:
             appointment.status = data['status']
         
+        # A moved appointment needs a fresh reminder; the reminder service picks it up on its next sync
+        if db.inspect(appointment).attrs.appointment_date.history.has_changes() or \
+                db.inspect(appointment).attrs.appointment_time.history.has_changes():
+            appointment.reminder_sent = False
+        
+        UserDataVersion.bump([appointment.user_id])
+        ResourceVersion.bump('appointments', [appointment.user_id])
+        alerts = Alert.evaluate_appointment(appointment)
         db.session.commit()
+        publish_alerts(alerts)
         
         return jsonify({
             'message': 'Appointment updated successfully',
@@ -126,6 +153,7 @@ def update_appointment(appointment_id):
         return jsonify({'error': str(e)}), 500
 
 @appointments_bp.route('/appointments/<int:appointment_id>', methods=['DELETE'])
+@query_budget(8)
 def delete_appointment(appointment_id):
     try:
         token = request.headers.get('Authorization')
@@ -143,7 +171,11 @@ def delete_appointment(appointment_id):
             return jsonify({'error': 'Access denied'}), 403
         
         db.session.delete(appointment)
+        UserDataVersion.bump([appointment.user_id])
+        ResourceVersion.bump('appointments', [appointment.user_id])
+        alerts = Alert.evaluate_appointment(appointment, deleted=True)
         db.session.commit()
+        publish_alerts(alerts)
         
         return jsonify({'message': 'Appointment deleted successfully'}), 200
         
@@ -151,6 +183,7 @@ def delete_appointment(appointment_id):
         return jsonify({'error': str(e)}), 500
 
 @appointments_bp.route('/appointments/<int:user_id>/upcoming', methods=['GET'])
+@query_budget(2)
 def get_upcoming_appointments(user_id):
     try:
         token = request.headers.get('Authorization')
@@ -1,15 +1,147 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
-from src.models.user import db, User
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from src.models.user import db, User, PASSWORD_HASH_METHOD
+from src.routes.metrics import query_budget, register_collector
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
 import jwt
 from datetime import datetime, timedelta
+import hashlib
 import os
+import threading
+import time
 
 auth_bp = Blueprint('auth', __name__)
 
 SECRET_KEY = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
 
+# Authorization context cache settings
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 300))  # seconds, never beyond token exp
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))  # bounds staleness across workers
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire at a per-entry deadline"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, expires_at):
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+# token hash -> user_id
+token_cache = TTLCache(TOKEN_CACHE_SIZE)
+# user_id -> column snapshot of the User row (including caregiver_id)
+user_cache = TTLCache(USER_CACHE_SIZE)
+
+# Password hashing pool settings; 0 workers hashes inline in the request thread
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8 * max(PASSWORD_HASH_WORKERS, 1)))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+class HashingPoolBusy(Exception):
+    """Raised when the password hashing pool cannot take more work"""
+
+class PasswordHashPool:
+    """Bounded process pool that keeps PBKDF2/scrypt work off the request thread
+    
+    At most `workers + max_pending` hashes are in flight; beyond that callers
+    are rejected immediately instead of queueing behind the login spike.
+    The executor is created lazily so each forked worker gets its own.
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+        self.executor = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.rejected = 0
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None or self.pid != os.getpid():
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                self.pid = os.getpid()
+            return self.executor
+
+    def run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingPoolBusy()
+        try:
+            future = self.get_executor().submit(func, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashingPoolBusy()
+
+password_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_TIMEOUT)
+
+def hash_password(password):
+    return password_pool.run(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+def verify_password(password_hash, password):
+    return password_pool.run(check_password_hash, password_hash, password)
+
+def hashing_busy_response():
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
 @auth_bp.route('/auth/register', methods=['POST'])
+@query_budget(3)
 def register():
     try:
         data = request.get_json()
@@ -24,6 +156,9 @@ def register():
         if User.query.filter_by(email=data['email']).first():
             return jsonify({'error': 'Email already registered'}), 400
         
+        # Release the pooled connection while waiting on the hashing pool
+        db.session.close()
+        
         # Create new user
         user = User(
             email=data['email'],
@@ -33,7 +168,7 @@ def register():
             is_elder=data.get('is_elder', True),
             caregiver_id=data.get('caregiver_id')
         )
-        user.set_password(data['password'])
+        user.password_hash = hash_password(data['password'])
         
         if 'date_of_birth' in data:
             user.date_of_birth = datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date()
@@ -53,10 +188,13 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except HashingPoolBusy:
+        return hashing_busy_response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/auth/login', methods=['POST'])
+@query_budget(3)
 def login():
     try:
         data = request.get_json()
@@ -66,9 +204,21 @@ def login():
         
         user = User.query.filter_by(email=data['email']).first()
         
-        if not user or not user.check_password(data['password']):
+        # Release the pooled connection while waiting on the hashing pool
+        db.session.close()
+        
+        if not user or not verify_password(user.password_hash, data['password']):
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        # Transparently upgrade hashes made with older parameters
+        if user.password_needs_rehash():
+            try:
+                user.password_hash = hash_password(data['password'])
+                db.session.add(user)
+                db.session.commit()
+            except HashingPoolBusy:
+                pass
+        
         # Generate JWT token
         token = jwt.encode({
             'user_id': user.id,
@@ -81,23 +231,26 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HashingPoolBusy:
+        return hashing_busy_response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/auth/profile', methods=['GET'])
+@query_budget(1)
 def get_profile():
     try:
         token = request.headers.get('Authorization')
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
         
-        if token.startswith('Bearer '):
-            token = token[7:]
-        
-        data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        user = User.query.get(data['user_id'])
+        user = verify_token(token)
         
         if not user:
+            # Only a rejected token is decoded again, to tell the caller why
+            if token.startswith('Bearer '):
+                token = token[7:]
+            jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
             return jsonify({'error': 'User not found'}), 404
         
         return jsonify({'user': user.to_dict()}), 200
@@ -110,17 +263,79 @@ def get_profile():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/auth/logout', methods=['POST'])
+@query_budget(0)
 def logout():
     # In a stateless JWT system, logout is handled client-side
     return jsonify({'message': 'Logout successful'}), 200
 
+def get_cached_user(user_id):
+    """Return the User with this id, served from the in-process cache when possible
+    
+    Cached rows are attached to the current session without a query, so the
+    returned instance behaves like one loaded by User.query.get.
+    """
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        user = User.query.get(user_id)
+        if user:
+            cache_user(user)
+        return user
+    return attach_snapshot(snapshot)
+
+def get_cached_users(user_ids):
+    """get_cached_user for several ids at once; returns {user_id: User} for those that exist
+    
+    Users missing from the cache are loaded with one query, not one each.
+    """
+    users, missing = {}, []
+    for user_id in set(user_ids):
+        snapshot = user_cache.get(user_id)
+        if snapshot is None:
+            missing.append(user_id)
+        else:
+            users[user_id] = attach_snapshot(snapshot)
+    if missing:
+        for user in User.query.filter(User.id.in_(missing)).all():
+            cache_user(user)
+            users[user.id] = user
+    return users
+
+def cache_user(user):
+    user_cache.set(user.id, {column: getattr(user, column) for column in USER_COLUMNS}, time.time() + USER_CACHE_TTL)
+
+def attach_snapshot(snapshot):
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
 def verify_token(token):
     """Helper function to verify JWT token"""
     try:
         if token.startswith('Bearer '):
             token = token[7:]
-        data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        return User.query.get(data['user_id'])
+        token_key = hashlib.sha256(token.encode()).digest()
+        user_id = token_cache.get(token_key)
+        if user_id is None:
+            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+            user_id = data['user_id']
+            expires_at = min(data.get('exp', 0), time.time() + TOKEN_CACHE_TTL)
+            token_cache.set(token_key, user_id, expires_at)
+        return get_cached_user(user_id)
     except:
         return None
 
+@register_collector
+def auth_cache_metrics(labels):
+    """Size and hit/miss counters of the token and user caches, for /api/metrics"""
+    stats = {'token': token_cache.stats(), 'user': user_cache.stats()}
+    lines = []
+    for name, key, kind, description in (
+        ('auth_cache_hits_total', 'hits', 'counter', 'Lookups served from the auth caches'),
+        ('auth_cache_misses_total', 'misses', 'counter', 'Lookups that fell through to the token decode or database'),
+        ('auth_cache_entries', 'size', 'gauge', 'Entries held in the auth caches')
+    ):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(f'{name}{{{labels},cache="{cache}"}} {counts[key]}' for cache, counts in stats.items())
+    return lines
+
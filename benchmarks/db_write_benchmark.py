@@ -0,0 +1,92 @@
+"""Concurrent write throughput benchmark for the database engine profile
+
+Runs several worker processes (like gunicorn workers) that post chat
+messages through the real /api/ai/chat write path against a fresh SQLite
+file, once with driver defaults (DB_ENGINE_PROFILE=none) and once with the
+production profile, and reports writes per second and failed requests:
+
+    python benchmarks/db_write_benchmark.py --workers 4 --seconds 10
+"""
+import os
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROFILES = ('none', 'production')
+
+def configure(database_path, profile):
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    os.environ['DB_ENGINE_PROFILE'] = profile
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+
+def setup(database_path, profile):
+    """Create the schema and the demo user in a fresh database"""
+    configure(database_path, profile)
+    from src.main import app, init_database
+    with app.app_context():
+        init_database(demo_user=True)
+
+def worker(database_path, profile, seconds, results):
+    configure(database_path, profile)
+    import jwt
+    from src.main import app
+    from src.routes.auth import SECRET_KEY
+
+    token = jwt.encode({'user_id': 1, 'exp': datetime.utcnow() + timedelta(hours=1)}, SECRET_KEY, algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+    ok = failed = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        response = client.post('/api/ai/chat', json={'message': 'Good morning, I took my pills'}, headers=headers)
+        if response.status_code == 200:
+            ok += 1
+        else:
+            failed += 1
+    results.put((ok, failed))
+
+def run(profile, workers, seconds):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'bench.db')
+        process = context.Process(target=setup, args=(database_path, profile))
+        process.start()
+        process.join()
+
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(database_path, profile, seconds, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        counts = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    ok = sum(count[0] for count in counts)
+    failed = sum(count[1] for count in counts)
+    return {
+        'profile': profile,
+        'workers': workers,
+        'chat_writes_per_second': round(ok / seconds, 1),
+        'failed_requests': failed
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='concurrent writer processes')
+    parser.add_argument('--seconds', type=float, default=10, help='duration per profile')
+    args = parser.parse_args()
+
+    print(json.dumps([run(profile, args.workers, args.seconds) for profile in PROFILES], indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""End-to-end load test: replay a realistic traffic mix and report latency, throughput and SQL per endpoint
+
+Seeds a fresh SQLite file with caregivers, their elders and their history
+(the `flask demo generate` dataset), starts the API on a local threaded server and runs concurrent clients
+against a weighted mix of elder chat, medication logging and caregiver
+polling. For each scenario it reports p50/p95/p99 latency, throughput and
+SQL statements per request (counted server-side). Save a run and compare
+later runs against it; the exit status is 1 if anything regressed:
+
+    python benchmarks/load_test.py --seconds 30 --output baseline.json
+    python benchmarks/load_test.py --seconds 30 --baseline baseline.json
+"""
+import os
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import argparse
+import json
+import logging
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+# (name, weight, who sends it, method, path template); paths are filled from the client's ids
+SCENARIOS = [
+    ('elder_chat', 30, 'elder', 'POST', '/ai/chat'),
+    ('medication_log', 15, 'elder', 'POST', '/medications/{medication_id}/log'),
+    ('elder_medications', 10, 'elder', 'GET', '/medications/{elder_id}'),
+    ('caregiver_elders', 10, 'caregiver', 'GET', '/caregiver/{caregiver_id}/elders'),
+    ('caregiver_overview', 10, 'caregiver', 'GET', '/caregiver/{caregiver_id}/overview'),
+    ('caregiver_dashboard', 15, 'caregiver', 'GET', '/caregiver/{elder_id}/dashboard'),
+    ('caregiver_alerts', 10, 'caregiver', 'GET', '/caregiver/{elder_id}/alerts')
+]
+CHAT_MESSAGES = [
+    'Good morning, I slept well last night',
+    'I took my blood pressure pills',
+    'I feel a bit lonely today',
+    'My knee hurts when I walk to the kitchen',
+    'What is on my schedule tomorrow?',
+    'I had a nice call with my daughter'
+]
+SCENARIO_HEADER = 'X-Load-Test-Scenario'
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 2)
+
+def seed(db, models, caregivers, elders_per_caregiver, history_days):
+    """Generate the dataset; returns [(caregiver_id, [(elder_id, [medication_ids])])]"""
+    User, Medication = models
+    from src.routes.demo import DatasetGenerator
+    DatasetGenerator(seed=0).generate(caregivers, elders_per_caregiver, history_days, include_demo=False)
+    
+    medications = {}
+    for medication_id, user_id in db.session.query(Medication.id, Medication.user_id):
+        medications.setdefault(user_id, []).append(medication_id)
+    families = {}
+    for elder_id, caregiver_id in db.session.query(User.id, User.caregiver_id).filter(User.caregiver_id.isnot(None)):
+        families.setdefault(caregiver_id, []).append((elder_id, medications[elder_id]))
+    return sorted(families.items())
+
+class SqlCounter:
+    """WSGI middleware counting SQL statements per request, grouped by the scenario header"""
+
+    def __init__(self, app, engine):
+        from sqlalchemy import event
+        self.app = app
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.counts = {}
+        event.listen(engine, 'before_cursor_execute', self.count)
+
+    def count(self, *args):
+        if getattr(self.local, 'statements', None) is not None:
+            self.local.statements += 1
+
+    def __call__(self, environ, start_response):
+        self.local.statements = 0
+        try:
+            # Consume the body here so statements run while streaming are counted too
+            body = b''.join(self.app(environ, start_response))
+        finally:
+            statements, self.local.statements = self.local.statements, None
+        scenario = environ.get('HTTP_' + SCENARIO_HEADER.upper().replace('-', '_'))
+        if scenario:
+            with self.lock:
+                self.counts.setdefault(scenario, []).append(statements)
+        return [body]
+
+def request(base_url, scenario, method, path, token, body=None, etag=None):
+    headers = {'Authorization': f'Bearer {token}'}
+    if scenario:
+        headers[SCENARIO_HEADER] = scenario
+    if body is not None:
+        headers['Content-Type'] = 'application/json'
+    if etag:
+        headers['If-None-Match'] = etag
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as response:
+            status, new_etag = response.status, response.headers.get('ETag')
+            response.read()
+    except urllib.error.HTTPError as e:
+        status, new_etag = e.code, e.headers.get('ETag') or etag
+        e.read()
+    return status, time.perf_counter() - started, new_etag
+
+def client(base_url, tokens, families, seed_value, deadline, warmup, samples):
+    """One simulated client: picks a caregiver family per request and a weighted scenario"""
+    rng = random.Random(seed_value)
+    names = [scenario[0] for scenario in SCENARIOS]
+    weights = [scenario[1] for scenario in SCENARIOS]
+    etags = {}
+    sent = 0
+    while time.perf_counter() < deadline:
+        caregiver_id, elders = rng.choice(families)
+        elder_id, medication_ids = rng.choice(elders)
+        name, _, sender, method, template = SCENARIOS[names.index(rng.choices(names, weights)[0])]
+        path = template.format(caregiver_id=caregiver_id, elder_id=elder_id, medication_id=rng.choice(medication_ids))
+        token = tokens[elder_id if sender == 'elder' else caregiver_id]
+        
+        body = None
+        if name == 'elder_chat':
+            body = {'message': rng.choice(CHAT_MESSAGES)}
+        elif name == 'medication_log':
+            body = {'status': rng.choice(['taken', 'taken', 'taken', 'missed']), 'confirmation_method': 'voice'}
+        # Pollers revalidate with the ETag of their last response, like the dashboard client
+        etag = etags.get((caregiver_id, path)) if method == 'GET' else None
+        # Warmup requests go unlabelled so the server doesn't count their SQL either
+        measured = sent >= warmup
+        status, elapsed, new_etag = request(base_url, name if measured else None, method, path, token, body, etag)
+        if new_etag:
+            etags[(caregiver_id, path)] = new_etag
+        
+        sent += 1
+        if measured:
+            samples.append((name, status, elapsed))
+
+def summarize(samples, sql_counts, seconds):
+    by_scenario = {}
+    for name, status, elapsed in samples:
+        by_scenario.setdefault(name, []).append((status, elapsed))
+    results = {}
+    for name, *_ in SCENARIOS:
+        entries = by_scenario.get(name, [])
+        latencies = [elapsed for _, elapsed in entries]
+        statuses = {}
+        for status, _ in entries:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        statements = sql_counts.get(name, [])
+        results[name] = {
+            'requests': len(entries),
+            'errors': sum(count for status, count in statuses.items() if int(status) >= 400),
+            'statuses': statuses,
+            'throughput_rps': round(len(entries) / seconds, 1),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'sql_per_request': round(sum(statements) / len(statements), 2) if statements else None,
+            'sql_max': max(statements) if statements else None
+        }
+    return results
+
+def compare(results, baseline, tolerance):
+    """Regressions against a saved run: slower p95/p99 beyond tolerance, or more SQL per request"""
+    regressions = []
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous or not current['requests'] or not previous['requests']:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {previous[metric]} -> {current[metric]}')
+        # Statement counts are deterministic per code path, so any real increase is a change
+        if (current['sql_per_request'] or 0) > (previous['sql_per_request'] or 0) + 0.5:
+            regressions.append(f"{name}: sql_per_request {previous['sql_per_request']} -> {current['sql_per_request']}")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    if results['throughput_rps'] < baseline.get('throughput_rps', 0) * (1 - tolerance):
+        regressions.append(f"throughput_rps {baseline['throughput_rps']} -> {results['throughput_rps']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--caregivers', type=int, default=20)
+    parser.add_argument('--elders-per-caregiver', type=int, default=5)
+    parser.add_argument('--history-days', type=int, default=30, help='days of history per elder')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent simulated clients')
+    parser.add_argument('--seconds', type=float, default=20, help='measured duration')
+    parser.add_argument('--warmup', type=int, default=20, help='requests per client excluded from the results')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the traffic mix')
+    parser.add_argument('--output', help='write the results to this JSON file (e.g. a new baseline)')
+    parser.add_argument('--baseline', help='compare against a previously saved results file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed latency/throughput change vs baseline')
+    args = parser.parse_args()
+    
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'load.db')}"
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+    
+    import jwt
+    from werkzeug.serving import make_server
+    from src.main import app, init_database
+    from src.models.user import db, User, Medication
+    from src.routes.auth import SECRET_KEY
+    
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with app.app_context():
+        init_database()
+        families = seed(db, [User, Medication], args.caregivers, args.elders_per_caregiver, args.history_days)
+        counter = SqlCounter(app.wsgi_app, db.engine)
+    app.wsgi_app = counter
+    
+    expires = datetime.utcnow() + timedelta(hours=1)
+    user_ids = [caregiver_id for caregiver_id, _ in families] + [elder_id for _, elders in families for elder_id, _ in elders]
+    tokens = {
+        user_id: jwt.encode({'user_id': user_id, 'exp': expires}, SECRET_KEY, algorithm='HS256')
+        for user_id in user_ids
+    }
+    
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}/api'
+    
+    samples = []
+    started = time.perf_counter()
+    deadline = started + args.seconds
+    threads = [
+        threading.Thread(target=client, args=(base_url, tokens, families, args.seed * 1000 + i, deadline, args.warmup, samples))
+        for i in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    server.shutdown()
+    
+    results = {
+        'recorded_at': datetime.utcnow().isoformat(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'wall_seconds': round(wall, 2),
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / wall, 1),
+        'endpoints': summarize(samples, counter.counts, wall)
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results['regressions'] = regressions
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Login spike benchmark
+
+Starts the API on a local threaded server, fires a burst of concurrent
+logins and, while they are in flight, measures the latency of a cheap
+authenticated endpoint. Run it once with the hashing pool and once with
+PASSWORD_HASH_WORKERS=0 (inline hashing) to compare. Users are seeded into
+a temporary SQLite file that is removed afterwards:
+
+    python benchmarks/login_benchmark.py --logins 200
+    PASSWORD_HASH_WORKERS=0 python benchmarks/login_benchmark.py --logins 200
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import logging
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+BENCH_PASSWORD = 'bench-password'
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 2)
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99)
+    }
+
+def seed_users(app, count):
+    """Create bench users sharing one precomputed hash so seeding stays fast"""
+    from src.main import init_database
+    from src.models.user import db, User
+
+    emails = [f'bench-login-{i}@example.com' for i in range(count)]
+    with app.app_context():
+        init_database()
+        template = User(email='template', full_name='Template')
+        template.set_password(BENCH_PASSWORD)
+        db.session.add_all([
+            User(email=email, full_name='Bench User', password_hash=template.password_hash)
+            for email in emails
+        ])
+        db.session.commit()
+    return emails
+
+def request(base_url, method, path, body=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, e.read()
+    return status, time.perf_counter() - started, payload
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200, help='concurrent logins to fire')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'login.db')}"
+        run(args)
+
+def run(args):
+    from src.main import create_app
+    from src.models.user import db
+    from src.routes.auth import PASSWORD_HASH_WORKERS
+
+    app = create_app()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    emails = seed_users(app, args.logins)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}/api'
+
+    # Token for the probe endpoint, obtained before the spike starts
+    _, _, payload = request(base_url, 'POST', '/auth/login', {'email': emails[0], 'password': BENCH_PASSWORD})
+    probe_token = json.loads(payload)['token']
+    probe_user_id = json.loads(payload)['user']['id']
+
+    login_latencies, rejected_latencies, probe_latencies, statuses = [], [], [], {}
+    done = threading.Event()
+
+    def login(email):
+        status, elapsed, _ = request(base_url, 'POST', '/auth/login', {'email': email, 'password': BENCH_PASSWORD})
+        statuses[status] = statuses.get(status, 0) + 1
+        if status == 200:
+            login_latencies.append(elapsed)
+        elif status == 503:
+            rejected_latencies.append(elapsed)
+
+    def probe():
+        while not done.is_set():
+            _, elapsed, _ = request(base_url, 'GET', f'/tasks/{probe_user_id}', token=probe_token)
+            probe_latencies.append(elapsed)
+
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.logins) as pool:
+        list(pool.map(login, emails))
+    wall = time.perf_counter() - started
+    done.set()
+    probe_thread.join()
+    server.shutdown()
+    server.server_close()
+    # Release the SQLite file so the temporary directory can be removed
+    with app.app_context():
+        db.engine.dispose()
+
+    print(json.dumps({
+        'hash_workers': PASSWORD_HASH_WORKERS,
+        'wall_seconds': round(wall, 2),
+        'login_statuses': statuses,
+        'login': summarize(login_latencies),
+        'rejected_login': summarize(rejected_latencies),
+        'other_endpoint_during_spike': summarize(probe_latencies)
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
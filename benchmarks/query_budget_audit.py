@@ -0,0 +1,16 @@
+"""Query budget audit: call every API route against a multi-user dataset and check its declared budget
+
+The audit is the test module tests/test_query_budgets.py, which runs with
+the rest of the suite; this runs just that module. Extra arguments are
+passed to pytest, and the exit status is pytest's:
+
+    python benchmarks/query_budget_audit.py -v
+"""
+import os
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([os.path.join(ROOT, 'tests', 'test_query_budgets.py'), *sys.argv[1:]]))
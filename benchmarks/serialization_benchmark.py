@@ -0,0 +1,130 @@
+"""List serialization benchmark: ORM instances + to_dict() + jsonify vs column tuples + fast encoder
+
+Seeds one user with --rows conversations, medications, appointments, tasks
+and caregiver reports in a fresh SQLite file, then builds each list
+response both ways and reports rows per second and peak traced memory:
+
+    python benchmarks/serialization_benchmark.py --rows 20000
+"""
+import os
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+def seed(db, models, user_id, rows):
+    Conversation, Medication, MedicationTimeSlot, Appointment, Task, CaregiverReport = models
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Conversation), [
+        {'user_id': user_id, 'message_text': f'Message number {i}, feeling fine today', 'message_type': 'user',
+         'timestamp': now - timedelta(minutes=i), 'mood_score': 7, 'contains_concern': False}
+        for i in range(rows)
+    ])
+    medication_ids = db.session.scalars(db.insert(Medication.__table__).returning(Medication.id), [
+        {'user_id': user_id, 'medication_name': f'Medication {i}', 'dosage': '10mg', 'frequency': 'twice daily',
+         'start_date': date(2026, 1, 1), 'is_active': True}
+        for i in range(rows)
+    ]).all()
+    db.session.execute(db.insert(MedicationTimeSlot), [
+        {'medication_id': medication_id, 'time_of_day': slot, 'days_mask': MedicationTimeSlot.ALL_DAYS}
+        for medication_id in medication_ids for slot in (datetime.min.time().replace(hour=8), datetime.min.time().replace(hour=20))
+    ])
+    db.session.execute(db.insert(Appointment), [
+        {'user_id': user_id, 'title': f'Checkup {i}', 'description': 'Routine visit',
+         'appointment_date': date(2026, 1, 1) + timedelta(days=i % 365), 'appointment_time': datetime.min.time(),
+         'location': 'Clinic', 'doctor_name': 'Dr. Smith', 'appointment_type': 'checkup',
+         'status': 'scheduled', 'reminder_sent': False}
+        for i in range(rows)
+    ])
+    db.session.execute(db.insert(Task), [
+        {'user_id': user_id, 'task_description': f'Task {i}', 'due_date': date(2026, 1, 1) + timedelta(days=i % 365),
+         'priority': 'medium', 'status': 'pending', 'category': 'daily'}
+        for i in range(rows)
+    ])
+    db.session.execute(db.insert(CaregiverReport), [
+        {'elder_id': user_id, 'caregiver_id': user_id, 'report_date': date(2026, 1, 1), 'mood_summary': 'Stable',
+         'medication_compliance': 95.0, 'appointment_attendance': 100.0, 'concerns_raised': '',
+         'ai_insights': json.dumps({'trend': 'stable', 'notes': ['slept well']})}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+def measure(build, rows):
+    """Best of three timed runs, plus peak traced memory of one run"""
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        build()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    body = build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'rows_per_second': round(rows / min(timings)),
+        'peak_memory_mb': round(peak / 1024 / 1024, 1),
+        'body_bytes': len(body)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000, help='rows per resource')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+
+    from flask import jsonify
+    from src.main import app, init_database
+    from src.models.user import db, User, Conversation, Medication, MedicationTimeSlot, Appointment, Task, CaregiverReport
+    from src.routes import serialization
+    from src.routes.serialization import (
+        json_response, conversation_rows, medication_rows, appointment_rows, task_rows, report_rows
+    )
+
+    resources = [
+        ('conversations', Conversation, Conversation.user_id, conversation_rows),
+        ('medications', Medication, Medication.user_id, medication_rows),
+        ('appointments', Appointment, Appointment.user_id, appointment_rows),
+        ('tasks', Task, Task.user_id, task_rows),
+        ('reports', CaregiverReport, CaregiverReport.elder_id, report_rows)
+    ]
+
+    results = []
+    with app.app_context():
+        init_database(demo_user=True)
+        user_id = User.query.filter_by(email='mary@example.com').first().id
+        seed(db, [Conversation, Medication, MedicationTimeSlot, Appointment, Task, CaregiverReport], user_id, args.rows)
+
+        for name, model, owner, serializer in resources:
+            def orm_path():
+                db.session.expunge_all()
+                rows = model.query.filter(owner == user_id).all()
+                return jsonify({name: [row.to_dict() for row in rows]}).get_data()
+
+            def column_path():
+                rows = model.query.filter(owner == user_id).with_entities(*serializer.columns).all()
+                return json_response({name: serializer.to_dicts(rows)}).get_data()
+
+            assert json.loads(orm_path()) == json.loads(column_path())
+            results.append({
+                'resource': name,
+                'orm_to_dict_jsonify': measure(orm_path, args.rows),
+                'columns_fast_encoder': measure(column_path, args.rows)
+            })
+
+    print(json.dumps({
+        'rows': args.rows,
+        'encoder': 'orjson' if serialization.orjson else 'json',
+        'results': results
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
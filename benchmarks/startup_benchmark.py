@@ -0,0 +1,127 @@
+"""Startup benchmark: time from a fresh interpreter importing the app to its first responses
+
+Each run starts a new Python process that imports src.main, builds the app
+and serves /api/health and then an authenticated, database-backed request,
+timing every phase. Three ways of starting are compared:
+
+- factory: the app as shipped; creating it doesn't touch the database.
+- init_on_start: the same, plus the schema check and demo user lookup
+  (init_database) that every worker used to run on import.
+- preload_fork: a parent builds the app once and forks workers, like
+  gunicorn's preload_app. Only fork to first response is timed in the child.
+
+    python benchmarks/startup_benchmark.py --runs 10
+"""
+import os
+import sys
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import argparse
+import json
+import statistics
+import subprocess
+import tempfile
+import time
+
+# Runs in the child process; prints the phase timings as JSON
+CHILD = """
+import time
+started = time.perf_counter()
+import sys
+sys.path.insert(0, {root!r})
+import src.main
+imported = time.perf_counter()
+app = src.main.create_app()
+created = time.perf_counter()
+if {init_on_start!r}:
+    with app.app_context():
+        src.main.init_database(demo_user=True)
+initialized = time.perf_counter()
+client = app.test_client()
+assert client.get('/api/health').status_code == 200
+first = time.perf_counter()
+assert client.get('/api/auth/profile', headers={{'Authorization': 'Bearer ' + {token!r}}}).status_code == 200
+first_db = time.perf_counter()
+import json
+print(json.dumps({{
+    'import_s': imported - started,
+    'create_app_s': created - imported,
+    'init_database_s': initialized - created,
+    'first_response_s': first - started,
+    'first_db_response_s': first_db - started
+}}))
+"""
+
+def run_child(token, init_on_start):
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', CHILD.format(root=ROOT, token=token, init_on_start=init_on_start)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    # Includes interpreter startup, which the in-process timings can't see
+    timings['process_to_first_db_response_s'] = time.perf_counter() - started
+    return timings
+
+def run_forked(app, token, workers):
+    """Fork workers from an already built app; each reports fork to first database-backed response"""
+    timings = []
+    for _ in range(workers):
+        read_end, write_end = os.pipe()
+        started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            client = app.test_client()
+            client.get('/api/health')
+            client.get('/api/auth/profile', headers={'Authorization': f'Bearer {token}'})
+            os.write(write_end, str(time.perf_counter() - started).encode())
+            os._exit(0)
+        os.close(write_end)
+        with os.fdopen(read_end) as pipe:
+            timings.append({'fork_to_first_db_response_s': float(pipe.read())})
+        os.waitpid(pid, 0)
+    return timings
+
+def summarize(runs):
+    return {
+        key: {'median_ms': round(statistics.median(run[key] for run in runs) * 1000, 1),
+              'max_ms': round(max(run[key] for run in runs) * 1000, 1)}
+        for key in runs[0]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='process starts per mode')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'startup.db')}"
+
+    import jwt
+    from datetime import datetime, timedelta
+    from src.main import create_app, init_database
+    from src.models.user import db
+    from src.routes.auth import SECRET_KEY
+
+    # One-off setup, as `flask init-db --demo-user` would do on a deployment
+    app = create_app()
+    with app.app_context():
+        init_database(demo_user=True)
+    token = jwt.encode({'user_id': 1, 'exp': datetime.utcnow() + timedelta(hours=1)}, SECRET_KEY, algorithm='HS256')
+
+    results = {
+        'factory': summarize([run_child(token, False) for _ in range(args.runs)]),
+        'init_on_start': summarize([run_child(token, True) for _ in range(args.runs)])
+    }
+    if hasattr(os, 'fork'):
+        # A preloading master has no connections open; drop the setup's pooled ones likewise
+        with app.app_context():
+            db.engine.dispose()
+        results['preload_fork'] = summarize(run_forked(app, token, args.runs))
+
+    print(json.dumps({'runs': args.runs, 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,30 @@
-from flask import Blueprint, request, jsonify
-from src.models.user import db, User, CaregiverReport, Conversation, MedicationLog, Appointment
-from src.routes.auth import verify_token
+from flask import Blueprint, request, jsonify, make_response
+from sqlalchemy import case, func
+from src.models.user import db, User, Alert, CaregiverReport, Conversation, ConversationDailyStats, MedicationLog, Appointment, UserDataVersion
+from src.routes.auth import verify_token, get_cached_user, TTLCache
+from src.routes.events import publish_alerts
+from src.routes.serialization import json_response, report_rows
+from src.routes.metrics import query_budget
 from datetime import datetime, date, timedelta
+import click
+import hashlib
+import json
+import os
+import time
 
 caregiver_bp = Blueprint('caregiver', __name__)
 
+DASHBOARD_CACHE_SIZE = int(os.environ.get('DASHBOARD_CACHE_SIZE', 5000))
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 300))  # bounds time-window drift
+
+# Upper bound on alerts returned by /alerts
+MAX_OPEN_ALERTS = 100
+
+# elder_id -> ((data version, elder updated_at), etag, dashboard)
+dashboard_cache = TTLCache(DASHBOARD_CACHE_SIZE)
+
 @caregiver_bp.route('/caregiver/<int:caregiver_id>/elders', methods=['GET'])
+@query_budget(2)
 def get_caregiver_elders(caregiver_id):
     try:
         token = request.headers.get('Authorization')
@@ -27,7 +46,139 @@ def get_caregiver_elders(caregiver_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@caregiver_bp.route('/caregiver/<int:caregiver_id>/overview', methods=['GET'])
+@query_budget(6)
+def get_caregiver_overview(caregiver_id):
+    """Key figures for every elder of a caregiver, using a fixed number of grouped queries"""
+    try:
+        token = request.headers.get('Authorization')
+        user = verify_token(token) if token else None
+        
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        # Check if user is the caregiver
+        if user.id != caregiver_id:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        sort = request.args.get('sort', 'risk')
+        if sort not in ('risk', 'name'):
+            return jsonify({'error': 'sort must be risk or name'}), 400
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+        
+        elders = User.query.filter_by(caregiver_id=caregiver_id, is_elder=True).all()
+        overview = build_overview(elders)
+        
+        if sort == 'risk':
+            overview.sort(key=lambda entry: (-entry['risk_score'], entry['elder']['full_name']))
+        else:
+            overview.sort(key=lambda entry: entry['elder']['full_name'])
+        
+        start = (page - 1) * per_page
+        return jsonify({
+            'overview': overview[start:start + per_page],
+            'total': len(overview),
+            'page': page,
+            'per_page': per_page
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def build_overview(elders):
+    """Per-elder compliance, mood, concerns, next appointment and alert counts"""
+    elder_ids = [elder.id for elder in elders]
+    if not elder_ids:
+        return []
+    
+    today = date.today()
+    tomorrow = today + timedelta(days=1)
+    yesterday = datetime.now() - timedelta(days=1)
+    week_ago = today - timedelta(days=7)
+    
+    # Medication compliance (last 7 days) and missed doses (last 24 hours)
+    medication_rows = db.session.query(
+        MedicationLog.user_id,
+        func.count(),
+        func.sum(case((MedicationLog.status == 'taken', 1), else_=0)),
+        func.sum(case(((MedicationLog.status == 'missed') & (MedicationLog.scheduled_time >= yesterday), 1), else_=0))
+    ).filter(
+        MedicationLog.user_id.in_(elder_ids),
+        MedicationLog.scheduled_time >= week_ago,
+        MedicationLog.scheduled_time < tomorrow
+    ).group_by(MedicationLog.user_id).all()
+    medications = {user_id: (total, taken, missed) for user_id, total, taken, missed in medication_rows}
+    
+    # Mood and concerns since yesterday, from the daily rollup
+    mood_rows = db.session.query(
+        ConversationDailyStats.user_id,
+        func.sum(ConversationDailyStats.mood_sum),
+        func.sum(ConversationDailyStats.mood_count),
+        func.sum(ConversationDailyStats.concern_count)
+    ).filter(
+        ConversationDailyStats.user_id.in_(elder_ids),
+        ConversationDailyStats.day >= yesterday.date()
+    ).group_by(ConversationDailyStats.user_id).all()
+    moods = {user_id: (mood_sum, mood_count, concerns) for user_id, mood_sum, mood_count, concerns in mood_rows}
+    
+    # Next scheduled appointment per elder
+    position = func.row_number().over(
+        partition_by=Appointment.user_id,
+        order_by=(Appointment.appointment_date, Appointment.appointment_time)
+    ).label('position')
+    ranked = db.select(Appointment, position).where(
+        Appointment.user_id.in_(elder_ids),
+        Appointment.appointment_date >= today,
+        Appointment.status == 'scheduled'
+    ).subquery()
+    next_appointment = db.aliased(Appointment, ranked)
+    next_appointments = {
+        apt.user_id: apt
+        for apt in db.session.query(next_appointment).filter(ranked.c.position == 1).all()
+    }
+    
+    open_alerts = count_open_alerts(elder_ids)
+    
+    overview = []
+    for elder in elders:
+        total, taken, missed = medications.get(elder.id, (0, 0, 0))
+        mood_sum, mood_count, concerns = moods.get(elder.id, (0, 0, 0))
+        compliance_rate = (taken / total * 100) if total else None
+        avg_mood = mood_sum / mood_count if mood_count else None
+        alerts = open_alerts.get(elder.id, 0)
+        apt = next_appointments.get(elder.id)
+        
+        overview.append({
+            'elder': elder.to_dict(),
+            'medication_compliance': round(compliance_rate, 2) if compliance_rate is not None else None,
+            'average_mood': round(avg_mood, 1) if avg_mood else None,
+            'concerns_raised': concerns,
+            'next_appointment': apt.to_dict() if apt else None,
+            'open_alerts': alerts,
+            'risk_score': risk_score(compliance_rate, avg_mood, concerns, alerts)
+        })
+    return overview
+
+def count_open_alerts(elder_ids):
+    """Number of open alerts for each elder"""
+    rows = db.session.query(Alert.elder_id, func.count()).filter(
+        Alert.elder_id.in_(elder_ids),
+        Alert.status == 'open'
+    ).group_by(Alert.elder_id).all()
+    return dict(rows)
+
+def risk_score(compliance_rate, avg_mood, concerns, open_alerts):
+    """Heuristic used to put the elders needing attention first"""
+    score = open_alerts * 10 + concerns * 2
+    if compliance_rate is not None:
+        score += (100 - compliance_rate) / 10
+    if avg_mood is not None:
+        score += max(0, 6 - avg_mood) * 2
+    return round(score, 1)
+
 @caregiver_bp.route('/caregiver/<int:elder_id>/reports', methods=['GET'])
+@query_budget(3)
 def get_elder_reports(elder_id):
     try:
         token = request.headers.get('Authorization')
@@ -36,7 +187,7 @@ def get_elder_reports(elder_id):
         if not user:
             return jsonify({'error': 'Authentication required'}), 401
         
-        elder = User.query.get(elder_id)
+        elder = get_cached_user(elder_id)
         if not elder:
             return jsonify({'error': 'Elder not found'}), 404
         
@@ -53,16 +204,17 @@ def get_elder_reports(elder_id):
             CaregiverReport.elder_id == elder_id,
             CaregiverReport.report_date >= start_date,
             CaregiverReport.report_date <= end_date
-        ).order_by(CaregiverReport.report_date.desc()).all()
+        ).order_by(CaregiverReport.report_date.desc()).with_entities(*report_rows.columns).all()
         
-        return jsonify({
-            'reports': [report.to_dict() for report in reports]
+        return json_response({
+            'reports': report_rows.to_dicts(reports)
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @caregiver_bp.route('/caregiver/<int:elder_id>/dashboard', methods=['GET'])
+@query_budget(6)
 def get_elder_dashboard(elder_id):
     try:
         token = request.headers.get('Authorization')
@@ -71,7 +223,7 @@ def get_elder_dashboard(elder_id):
         if not user:
             return jsonify({'error': 'Authentication required'}), 401
         
-        elder = User.query.get(elder_id)
+        elder = get_cached_user(elder_id)
         if not elder:
             return jsonify({'error': 'Elder not found'}), 404
         
@@ -79,67 +231,80 @@ def get_elder_dashboard(elder_id):
         if user.id != elder.caregiver_id:
             return jsonify({'error': 'Access denied'}), 403
         
-        # Get today's data
-        today = date.today()
-        
-        # Recent conversations (last 24 hours)
-        yesterday = datetime.now() - timedelta(days=1)
-        recent_conversations = Conversation.query.filter(
-            Conversation.user_id == elder_id,
-            Conversation.timestamp >= yesterday
-        ).order_by(Conversation.timestamp.desc()).limit(10).all()
-        
-        # Medication compliance (last 7 days)
-        week_ago = today - timedelta(days=7)
-        medication_logs = MedicationLog.query.filter(
-            MedicationLog.user_id == elder_id,
-            MedicationLog.scheduled_time >= week_ago
-        ).all()
-        
-        total_scheduled = len(medication_logs)
-        taken = len([log for log in medication_logs if log.status == 'taken'])
-        compliance_rate = (taken / total_scheduled * 100) if total_scheduled > 0 else 0
-        
-        # Mood analysis (last 7 days)
-        mood_conversations = Conversation.query.filter(
-            Conversation.user_id == elder_id,
-            Conversation.timestamp >= yesterday,
-            Conversation.mood_score.isnot(None)
-        ).all()
-        
-        mood_scores = [c.mood_score for c in mood_conversations]
-        avg_mood = sum(mood_scores) / len(mood_scores) if mood_scores else None
-        
-        # Concerns raised (last 7 days)
-        concerns = Conversation.query.filter(
-            Conversation.user_id == elder_id,
-            Conversation.timestamp >= yesterday,
-            Conversation.contains_concern == True
-        ).count()
-        
-        # Upcoming appointments
-        upcoming_appointments = Appointment.query.filter(
-            Appointment.user_id == elder_id,
-            Appointment.appointment_date >= today,
-            Appointment.status == 'scheduled'
-        ).order_by(Appointment.appointment_date, Appointment.appointment_time).limit(5).all()
-        
-        return jsonify({
-            'dashboard': {
-                'elder_info': elder.to_dict(),
-                'today_interactions': len(recent_conversations),
-                'medication_compliance': round(compliance_rate, 2),
-                'average_mood': round(avg_mood, 1) if avg_mood else None,
-                'concerns_raised': concerns,
-                'recent_conversations': [conv.to_dict() for conv in recent_conversations],
-                'upcoming_appointments': [apt.to_dict() for apt in upcoming_appointments]
-            }
-        }), 200
+        # Serve from cache unless the elder's data version moved on
+        version_key = (UserDataVersion.current(elder_id), elder.updated_at)
+        cached = dashboard_cache.get(elder_id)
+        if cached is None or cached[0] != version_key:
+            dashboard = build_dashboard(elder)
+            etag = hashlib.sha1(json.dumps(dashboard, sort_keys=True).encode()).hexdigest()
+            cached = (version_key, etag, dashboard)
+            dashboard_cache.set(elder_id, cached, time.time() + DASHBOARD_CACHE_TTL)
+        
+        _, etag, dashboard = cached
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = jsonify({'dashboard': dashboard})
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def build_dashboard(elder):
+    """Assemble the dashboard from one aggregate query and two short list queries"""
+    today = date.today()
+    yesterday = datetime.now() - timedelta(days=1)
+    week_ago = today - timedelta(days=7)
+    
+    # Medication compliance (last 7 days), mood and concerns since yesterday
+    log_window = (
+        MedicationLog.user_id == elder.id,
+        MedicationLog.scheduled_time >= week_ago,
+        MedicationLog.scheduled_time < today + timedelta(days=1)
+    )
+    stats_window = (
+        ConversationDailyStats.user_id == elder.id,
+        ConversationDailyStats.day >= yesterday.date()
+    )
+    total_scheduled, taken, mood_sum, mood_count, concerns = db.session.execute(db.select(
+        db.select(func.count()).where(*log_window).scalar_subquery(),
+        db.select(func.coalesce(func.sum(case((MedicationLog.status == 'taken', 1), else_=0)), 0))
+            .where(*log_window).scalar_subquery(),
+        db.select(func.coalesce(func.sum(ConversationDailyStats.mood_sum), 0)).where(*stats_window).scalar_subquery(),
+        db.select(func.coalesce(func.sum(ConversationDailyStats.mood_count), 0)).where(*stats_window).scalar_subquery(),
+        db.select(func.coalesce(func.sum(ConversationDailyStats.concern_count), 0)).where(*stats_window).scalar_subquery()
+    )).one()
+    
+    compliance_rate = (taken / total_scheduled * 100) if total_scheduled > 0 else 0
+    avg_mood = mood_sum / mood_count if mood_count else None
+    
+    # Recent conversations (last 24 hours)
+    recent_conversations = Conversation.query.filter(
+        Conversation.user_id == elder.id,
+        Conversation.timestamp >= yesterday
+    ).order_by(Conversation.timestamp.desc()).limit(10).all()
+    
+    # Upcoming appointments
+    upcoming_appointments = Appointment.query.filter(
+        Appointment.user_id == elder.id,
+        Appointment.appointment_date >= today,
+        Appointment.status == 'scheduled'
+    ).order_by(Appointment.appointment_date, Appointment.appointment_time).limit(5).all()
+    
+    return {
+        'elder_info': elder.to_dict(),
+        'today_interactions': len(recent_conversations),
+        'medication_compliance': round(compliance_rate, 2),
+        'average_mood': round(avg_mood, 1) if avg_mood else None,
+        'concerns_raised': concerns,
+        'recent_conversations': [conv.to_dict() for conv in recent_conversations],
+        'upcoming_appointments': [apt.to_dict() for apt in upcoming_appointments]
+    }
+
 @caregiver_bp.route('/caregiver/<int:elder_id>/alerts', methods=['GET'])
+@query_budget(3)
 def get_elder_alerts(elder_id):
     try:
         token = request.headers.get('Authorization')
@@ -148,7 +313,7 @@ def get_elder_alerts(elder_id):
         if not user:
             return jsonify({'error': 'Authentication required'}), 401
         
-        elder = User.query.get(elder_id)
+        elder = get_cached_user(elder_id)
         if not elder:
             return jsonify({'error': 'Elder not found'}), 404
         
@@ -156,78 +321,62 @@ def get_elder_alerts(elder_id):
         if user.id != elder.caregiver_id:
             return jsonify({'error': 'Access denied'}), 403
         
-        alerts = []
-        today = date.today()
-        yesterday = datetime.now() - timedelta(days=1)
-        
-        # Check for missed medications
-        missed_meds = MedicationLog.query.filter(
-            MedicationLog.user_id == elder_id,
-            MedicationLog.scheduled_time >= yesterday,
-            MedicationLog.status == 'missed'
-        ).count()
-        
-        if missed_meds > 0:
-            alerts.append({
-                'type': 'medication',
-                'severity': 'high' if missed_meds > 2 else 'medium',
-                'message': f'{missed_meds} missed medication(s) in the last 24 hours',
-                'timestamp': datetime.now().isoformat()
-            })
-        
-        # Check for concerning conversations
-        concerning_conversations = Conversation.query.filter(
-            Conversation.user_id == elder_id,
-            Conversation.timestamp >= yesterday,
-            Conversation.contains_concern == True
-        ).all()
-        
-        for conv in concerning_conversations:
-            alerts.append({
-                'type': 'conversation',
-                'severity': 'medium',
-                'message': f'Concerning conversation detected: {conv.message_text[:100]}...',
-                'timestamp': conv.timestamp.isoformat()
-            })
-        
-        # Check for low mood
-        low_mood_conversations = Conversation.query.filter(
-            Conversation.user_id == elder_id,
-            Conversation.timestamp >= yesterday,
-            Conversation.mood_score <= 4
-        ).all()
-        
-        if low_mood_conversations:
-            alerts.append({
-                'type': 'mood',
-                'severity': 'medium',
-                'message': f'Low mood detected in recent conversations',
-                'timestamp': datetime.now().isoformat()
-            })
-        
-        # Check for upcoming appointments without reminders
-        upcoming_no_reminder = Appointment.query.filter(
-            Appointment.user_id == elder_id,
-            Appointment.appointment_date == today + timedelta(days=1),
-            Appointment.reminder_sent == False
-        ).all()
-        
-        for apt in upcoming_no_reminder:
-            alerts.append({
-                'type': 'appointment',
-                'severity': 'low',
-                'message': f'Reminder needed for appointment: {apt.title}',
-                'timestamp': datetime.now().isoformat()
-            })
+        # Alerts are materialized when the triggering row is written
+        alerts = Alert.query.filter_by(elder_id=elder_id, status='open')\
+            .order_by(Alert.last_seen_at.desc())\
+            .limit(MAX_OPEN_ALERTS).all()
+        
+        return jsonify({
+            'alerts': [alert.to_dict() for alert in alerts]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@caregiver_bp.route('/caregiver/alerts/<int:alert_id>/acknowledge', methods=['POST'])
+@query_budget(3)
+def acknowledge_alert(alert_id):
+    try:
+        token = request.headers.get('Authorization')
+        user = verify_token(token) if token else None
+        
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        alert = Alert.query.get(alert_id)
+        if not alert:
+            return jsonify({'error': 'Alert not found'}), 404
+        
+        elder = get_cached_user(alert.elder_id)
+        
+        # Check if user is the caregiver for this elder
+        if not elder or user.id != elder.caregiver_id:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        if alert.status == 'open':
+            alert.status = 'acknowledged'
+            alert.acknowledged_at = datetime.utcnow()
+            alert.acknowledged_by = user.id
+            db.session.commit()
+            publish_alerts([alert])
         
         return jsonify({
-            'alerts': sorted(alerts, key=lambda x: x['timestamp'], reverse=True)
+            'message': 'Alert acknowledged',
+            'alert': alert.to_dict()
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@caregiver_bp.cli.command('evaluate-alerts')
+def evaluate_alerts():
+    """Raise alerts whose trigger is the passage of time (appointments tomorrow)"""
+    alerts = Alert.evaluate_upcoming_appointments()
+    db.session.commit()
+    click.echo(f'{len(alerts)} appointment alert(s) raised or refreshed')
+
 @caregiver_bp.route('/caregiver/reports', methods=['POST'])
+@query_budget(4)
 def create_caregiver_report():
     try:
         token = request.headers.get('Authorization')
@@ -242,7 +391,7 @@ def create_caregiver_report():
         if 'elder_id' not in data:
             return jsonify({'error': 'elder_id is required'}), 400
         
-        elder = User.query.get(data['elder_id'])
+        elder = get_cached_user(data['elder_id'])
         if not elder:
             return jsonify({'error': 'Elder not found'}), 404
         
@@ -0,0 +1,35 @@
+from flask import request, Response
+from src.models.user import ResourceVersion
+import hashlib
+
+def list_validators(resource, user_id, vary=None):
+    """ETag and Last-Modified for a user's list of `resource`, from one primary-key lookup
+
+    The ETag covers the query string, since filters and cursors change the
+    body. Pass `vary` for anything else the body depends on (e.g. today's
+    date); such lists get no Last-Modified, as they change without a write.
+    """
+    version, modified_at = ResourceVersion.current(resource, user_id)
+    tag = f'{resource}-{user_id}-{version}'
+    if request.query_string or vary:
+        tag += '-' + hashlib.sha256(request.query_string + str(vary).encode()).hexdigest()[:16]
+    return tag, modified_at if vary is None else None
+
+def is_not_modified(etag, last_modified):
+    # If-None-Match wins over If-Modified-Since, which only has one-second resolution
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Let clients cache, but revalidate on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def not_modified(etag, last_modified):
+    return with_validators(Response(status=304), etag, last_modified)
@@ -1,11 +1,31 @@
 from flask import Blueprint, request, jsonify
-from src.models.user import db, Conversation
+from sqlalchemy import tuple_
+from src.models.user import db, Alert, Conversation, ConversationDailyStats, ResourceVersion, UserDataVersion
 from src.routes.auth import verify_token
-from datetime import datetime, timedelta
+from src.routes.conditional import is_not_modified, list_validators, not_modified, with_validators
+from src.routes.serialization import json_response, conversation_rows
+from src.routes.events import publish_alerts, publish_conversations
+from src.routes.metrics import query_budget
+from datetime import datetime, time, timedelta
+import base64
+import click
 
 conversations_bp = Blueprint('conversations', __name__)
 
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(conversation):
+    """Opaque cursor for a row's position in (timestamp, id) order"""
+    raw = f'{conversation.timestamp.isoformat()}|{conversation.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    timestamp, conversation_id = raw.split('|')
+    return datetime.fromisoformat(timestamp), int(conversation_id)
+
 @conversations_bp.route('/conversations/<int:user_id>', methods=['GET'])
+@query_budget(3)
 def get_conversations(user_id):
     try:
         token = request.headers.get('Authorization')
@@ -18,23 +38,63 @@ def get_conversations(user_id):
         if user.id != user_id and user.caregiver_id != user.id:
             return jsonify({'error': 'Access denied'}), 403
         
+        # Answer conditional requests from the version counter, before loading any rows
+        etag, last_modified = list_validators('conversations', user_id)
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+        
         # Get query parameters
-        limit = request.args.get('limit', 50, type=int)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_PAGE_SIZE)
         offset = request.args.get('offset', 0, type=int)
-        
-        conversations = Conversation.query.filter_by(user_id=user_id)\
-            .order_by(Conversation.timestamp.desc())\
-            .limit(limit).offset(offset).all()
-        
-        return jsonify({
-            'conversations': [conv.to_dict() for conv in conversations],
-            'total': Conversation.query.filter_by(user_id=user_id).count()
-        }), 200
+        before = request.args.get('before')
+        after = request.args.get('after')
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        
+        query = Conversation.query.filter_by(user_id=user_id)
+        position = tuple_(Conversation.timestamp, Conversation.id)
+        
+        try:
+            if before:
+                query = query.filter(position < decode_cursor(before))
+            if after:
+                query = query.filter(position > decode_cursor(after))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        # Walk forward from an `after` cursor, otherwise newest first;
+        # one extra row tells us whether another page exists
+        if after and not before:
+            query = query.order_by(Conversation.timestamp, Conversation.id)
+        else:
+            query = query.order_by(Conversation.timestamp.desc(), Conversation.id.desc())
+        
+        if offset and not (before or after):
+            query = query.offset(offset)
+        
+        conversations = query.with_entities(*conversation_rows.columns).limit(limit + 1).all()
+        has_more = len(conversations) > limit
+        conversations = conversations[:limit]
+        if after and not before:
+            conversations.reverse()
+        
+        response = {
+            'conversations': conversation_rows.to_dicts(conversations),
+            'has_more': has_more,
+            'next_cursor': encode_cursor(conversations[-1]) if conversations else None,
+            'prev_cursor': encode_cursor(conversations[0]) if conversations else None
+        }
+        
+        # Counting a long history is expensive, so only do it on request
+        if include_total:
+            response['total'] = Conversation.query.filter_by(user_id=user_id).count()
+        
+        return with_validators(json_response(response), etag, last_modified), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @conversations_bp.route('/conversations', methods=['POST'])
+@query_budget(6)
 def create_conversation():
     try:
         token = request.headers.get('Authorization')
@@ -58,7 +118,13 @@ def create_conversation():
         )
         
         db.session.add(conversation)
+        ConversationDailyStats.record([conversation])
+        UserDataVersion.bump([conversation.user_id])
+        ResourceVersion.bump('conversations', [conversation.user_id])
+        alerts = Alert.evaluate_conversations([conversation])
         db.session.commit()
+        publish_conversations([conversation])
+        publish_alerts(alerts)
         
         return jsonify({
             'message': 'Conversation saved successfully',
@@ -69,6 +135,7 @@ def create_conversation():
         return jsonify({'error': str(e)}), 500
 
 @conversations_bp.route('/conversations/<int:user_id>/summary', methods=['GET'])
+@query_budget(2)
 def get_conversation_summary(user_id):
     try:
         token = request.headers.get('Authorization')
@@ -81,25 +148,21 @@ def get_conversation_summary(user_id):
         if user.id != user_id and user.caregiver_id != user.id:
             return jsonify({'error': 'Access denied'}), 403
         
-        # Get date range
+        # Get date range, in whole days so it can be answered from the daily rollup
         days = request.args.get('days', 7, type=int)
         end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
+        start_date = datetime.combine((end_date - timedelta(days=days)).date(), time.min)
         
-        conversations = Conversation.query.filter(
-            Conversation.user_id == user_id,
-            Conversation.timestamp >= start_date,
-            Conversation.timestamp <= end_date
-        ).all()
+        stats = ConversationDailyStats.for_window(user_id, start_date.date(), end_date.date())
         
         # Calculate summary statistics
-        total_messages = len(conversations)
-        ai_messages = len([c for c in conversations if c.message_type == 'ai'])
-        user_messages = len([c for c in conversations if c.message_type == 'user'])
-        concerns = len([c for c in conversations if c.contains_concern])
+        total_messages = sum(s.message_count for s in stats)
+        ai_messages = sum(s.message_count for s in stats if s.message_type in ('ai', 'checkin'))
+        user_messages = sum(s.message_count for s in stats if s.message_type == 'user')
+        concerns = sum(s.concern_count for s in stats)
         
-        mood_scores = [c.mood_score for c in conversations if c.mood_score]
-        avg_mood = sum(mood_scores) / len(mood_scores) if mood_scores else None
+        mood_count = sum(s.mood_count for s in stats)
+        avg_mood = sum(s.mood_sum for s in stats) / mood_count if mood_count else None
         
         return jsonify({
             'summary': {
@@ -118,3 +181,10 @@ def get_conversation_summary(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@conversations_bp.cli.command('rebuild-stats')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user')
+def rebuild_conversation_stats(user_id):
+    """Rebuild the daily conversation rollup from existing conversations"""
+    ConversationDailyStats.rebuild(user_id)
+    db.session.commit()
+    click.echo('Conversation daily stats rebuilt')
@@ -1,9 +1,19 @@
-from flask import Blueprint, request, jsonify
-from src.models.user import db, User
-from datetime import datetime
+from flask import Blueprint, jsonify
+from src.models.user import (
+    db, User, Alert, Appointment, CaregiverReport, Conversation, ConversationDailyStats, Medication,
+    MedicationAdherenceStats, MedicationLog, MedicationTimeSlot, ResourceVersion, Task, UserDataVersion
+)
+from src.routes.auth import hash_password
+from src.routes.metrics import query_budget
+from datetime import datetime, date, time, timedelta
+from time import monotonic
+import click
+import json
+import random
 
 # Create a test user for demo purposes
-def create_demo_user():
+def add_demo_user():
+    """The demo user, added to the session and flushed if she doesn't exist yet; the caller commits"""
     # Check if demo user already exists
     existing_user = User.query.filter_by(email='mary@example.com').first()
     if existing_user:
@@ -20,12 +30,18 @@ def create_demo_user():
     demo_user.set_password('password123')
     
     db.session.add(demo_user)
+    db.session.flush()
+    return demo_user
+
+def create_demo_user():
+    demo_user = add_demo_user()
     db.session.commit()
     return demo_user
 
 demo_bp = Blueprint('demo', __name__)
 
 @demo_bp.route('/demo/setup', methods=['POST'])
+@query_budget(3)
 def setup_demo():
     try:
         user = create_demo_user()
@@ -36,3 +52,315 @@ def setup_demo():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Canned content for generated history: (user message, mood score, raises a concern)
+SYNTHETIC_MESSAGES = [
+    ('Good morning, I slept well last night', 8, False),
+    ('I took my pills with breakfast', 7, False),
+    ('I had a lovely call with my daughter', 9, False),
+    ('What is on my schedule today?', 6, False),
+    ('The weather is nice, I might go for a walk', 8, False),
+    ('I feel a bit tired this afternoon', 5, False),
+    ('I feel lonely today, nobody has visited', 3, False),
+    ('My knee hurts when I climb the stairs', 4, True),
+    ('I felt dizzy when I stood up', 3, True),
+    ('I watched my favourite show this evening', 7, False)
+]
+SYNTHETIC_REPLIES = [
+    "That's wonderful to hear! How are you feeling now?",
+    "Thank you for letting me know. Would you like me to remind you later?",
+    "I'm here for you. Would you like to talk about it?",
+    "Let me check your schedule for you."
+]
+SYNTHETIC_MEDICATIONS = [
+    ('Lisinopril', '10mg', ['08:00']),
+    ('Metformin', '500mg', ['08:00', '20:00']),
+    ('Atorvastatin', '20mg', ['21:00']),
+    ('Levothyroxine', '50mcg', ['07:00']),
+    ('Amlodipine', '5mg', ['09:00']),
+    ('Vitamin D', '1000IU', [{'time': '12:00', 'days': ['mon', 'wed', 'fri']}])
+]
+SYNTHETIC_APPOINTMENTS = [
+    ('Annual Checkup', 'Dr. Smith', 'checkup'),
+    ('Cardiology Follow-up', 'Dr. Patel', 'specialist'),
+    ('Physical Therapy', 'Sam Lee, PT', 'therapy'),
+    ('Eye Exam', 'Dr. Garcia', 'specialist')
+]
+SYNTHETIC_TASKS = [
+    ('Take a 15 minute walk', 'daily'),
+    ('Call Sarah', 'daily'),
+    ('Refill pill organizer', 'medication'),
+    ('Check blood pressure', 'health'),
+    ('Drink 6 glasses of water', 'health')
+]
+# Rows buffered per table before an executemany
+SYNTHETIC_BATCH_SIZE = 20000
+
+class DatasetGenerator:
+    """Deterministic bulk loader for production-scale demo data
+    
+    Everything is derived from `seed` and `end_date`, so the same options
+    always produce the same rows. Rows go in with Core executemany
+    batches; the conversation and adherence rollups are computed while
+    generating instead of being rebuilt afterwards, and the version
+    counters of every touched user are bumped so cached and conditional
+    reads see the new data.
+    """
+
+    def __init__(self, seed=0, end_date=None, password='password123', batch_size=SYNTHETIC_BATCH_SIZE):
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.end_date = end_date or date.today()
+        self.batch_size = batch_size
+        # One hash for every generated account: hashing is deliberately slow
+        self.password_hash = hash_password(password)
+        self.buffers = {}
+        self.counts = {}
+        self.slots = [
+            [MedicationTimeSlot.parse(value) for value in slots]
+            for _, _, slots in SYNTHETIC_MEDICATIONS
+        ]
+
+    def add(self, model, row):
+        buffer = self.buffers.setdefault(model, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        for table_model in ([model] if model else list(self.buffers)):
+            rows = self.buffers.pop(table_model, [])
+            if rows:
+                db.session.execute(db.insert(table_model.__table__), rows)
+                self.counts[table_model.__tablename__] = self.counts.get(table_model.__tablename__, 0) + len(rows)
+
+    def insert_returning_ids(self, model, rows):
+        table = model.__table__
+        ids = db.session.scalars(db.insert(table).returning(table.c.id, sort_by_parameter_order=True), rows).all()
+        self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + len(rows)
+        return ids
+
+    def create_users(self, prefix, count, is_elder, caregiver_ids=None):
+        now = datetime.utcnow()
+        return self.insert_returning_ids(User, [
+            {
+                'email': f'{prefix}-{self.seed}-{index}@example.com',
+                'password_hash': self.password_hash,
+                'full_name': f"{'Elder' if is_elder else 'Caregiver'} {index}",
+                'phone_number': f'555-{index % 10000:04d}',
+                'is_elder': is_elder,
+                'caregiver_id': caregiver_ids[index] if caregiver_ids else None,
+                'date_of_birth': date(1930 + self.random.randrange(30), 1 + self.random.randrange(12), 1) if is_elder else None,
+                'created_at': now,
+                'updated_at': now
+            }
+            for index in range(count)
+        ])
+
+    def generate(self, caregivers, elders_per_caregiver, days, heavy_elder_days=0, include_demo=True):
+        """Create the accounts and their history; returns {table name: rows inserted}"""
+        caregiver_ids = self.create_users('caregiver', caregivers, False)
+        elder_caregivers = [caregiver_id for caregiver_id in caregiver_ids for _ in range(elders_per_caregiver)]
+        elder_ids = self.create_users('elder', len(elder_caregivers), True, elder_caregivers)
+        histories = [(elder_id, caregiver_id, days, 1) for elder_id, caregiver_id in zip(elder_ids, elder_caregivers)]
+        
+        if include_demo and caregiver_ids:
+            # Give Mary a caregiver and the same kind of history, unless she already has one
+            # Flush only, so the whole dataset still commits as one transaction
+            mary = add_demo_user()
+            if mary.caregiver_id is None:
+                mary.caregiver_id = caregiver_ids[0]
+                histories.append((mary.id, caregiver_ids[0], days, 1))
+        if heavy_elder_days and caregiver_ids:
+            # One elder with years of dense history for pagination and analytics stress tests
+            heavy_id = self.create_users('heavy-elder', 1, True, caregiver_ids[:1])[0]
+            histories.append((heavy_id, caregiver_ids[0], heavy_elder_days, 4))
+        
+        for elder_id, caregiver_id, history_days, intensity in histories:
+            self.generate_elder(elder_id, caregiver_id, history_days, intensity)
+        self.flush()
+        
+        elders = [elder_id for elder_id, *_ in histories]
+        UserDataVersion.bump(elders)
+        for resource in ('conversations', 'medications', 'appointments', 'tasks'):
+            ResourceVersion.bump(resource, elders)
+        Alert.evaluate_upcoming_appointments()
+        db.session.commit()
+        return self.counts
+
+    def generate_elder(self, elder_id, caregiver_id, days, intensity):
+        rng = self.random
+        first_day = self.end_date - timedelta(days=days)
+        self.generate_conversations(elder_id, first_day, days, intensity)
+        self.generate_medications(elder_id, first_day, days)
+        
+        # Appointments roughly twice a month, a few still upcoming
+        for offset in range(rng.randrange(14), days + 45, 15):
+            appointment_date = first_day + timedelta(days=offset)
+            title, doctor, appointment_type = rng.choice(SYNTHETIC_APPOINTMENTS)
+            upcoming = appointment_date >= self.end_date
+            self.add(Appointment, {
+                'user_id': elder_id,
+                'title': title,
+                'description': 'Bring your medication list',
+                'appointment_date': appointment_date,
+                'appointment_time': time(9 + rng.randrange(8), rng.choice((0, 30))),
+                'location': 'Community Health Center',
+                'doctor_name': doctor,
+                'appointment_type': appointment_type,
+                'status': 'scheduled' if upcoming else ('cancelled' if rng.random() < 0.05 else 'completed'),
+                'reminder_sent': not upcoming
+            })
+        
+        # Most days have a task; past ones are mostly done
+        for offset in range(days + 7):
+            if rng.random() < 0.3:
+                continue
+            due_date = first_day + timedelta(days=offset)
+            description, category = rng.choice(SYNTHETIC_TASKS)
+            self.add(Task, {
+                'user_id': elder_id,
+                'task_description': description,
+                'due_date': due_date,
+                'due_time': time(10 + rng.randrange(8)),
+                'priority': rng.choice(('low', 'medium', 'medium', 'high')),
+                'status': 'pending' if due_date >= self.end_date else ('completed' if rng.random() < 0.85 else 'overdue'),
+                'category': category
+            })
+        
+        # Weekly caregiver reports
+        for offset in range(6, days, 7):
+            compliance = round(rng.uniform(70, 100), 1)
+            self.add(CaregiverReport, {
+                'elder_id': elder_id,
+                'caregiver_id': caregiver_id,
+                'report_date': first_day + timedelta(days=offset),
+                'mood_summary': rng.choice(('Stable', 'Improving', 'Slightly low')),
+                'medication_compliance': compliance,
+                'appointment_attendance': rng.choice((100.0, 100.0, 50.0)),
+                'concerns_raised': '' if compliance > 80 else 'Several missed doses this week',
+                'ai_insights': json.dumps({'trend': 'stable' if compliance > 80 else 'declining'})
+            })
+
+    def generate_conversations(self, elder_id, first_day, days, intensity):
+        rng = self.random
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            daily = {}
+            minute = 7 * 60
+            for _ in range(rng.randrange(1, 5) * intensity):
+                minute += rng.randrange(20, 180 // intensity + 21)
+                if minute >= 22 * 60:
+                    break
+                text, mood, concern = rng.choice(SYNTHETIC_MESSAGES)
+                mood = min(10, max(1, mood + rng.randrange(-1, 2)))
+                timestamp = datetime.combine(day, time(minute // 60, minute % 60))
+                for message_type, message_text, at in (
+                    ('user', text, timestamp),
+                    ('ai', rng.choice(SYNTHETIC_REPLIES), timestamp + timedelta(seconds=2))
+                ):
+                    self.add(Conversation, {
+                        'user_id': elder_id,
+                        'message_text': message_text,
+                        'message_type': message_type,
+                        'timestamp': at,
+                        'mood_score': mood,
+                        'contains_concern': concern
+                    })
+                    stats = daily.setdefault(message_type, [0, 0, 0, 0])
+                    stats[0] += 1
+                    stats[1] += mood
+                    stats[2] += 1
+                    stats[3] += concern
+            for message_type, (count, mood_sum, mood_count, concerns) in daily.items():
+                self.add(ConversationDailyStats, {
+                    'user_id': elder_id,
+                    'day': day,
+                    'message_type': message_type,
+                    'message_count': count,
+                    'mood_sum': mood_sum,
+                    'mood_count': mood_count,
+                    'concern_count': concerns
+                })
+
+    def generate_medications(self, elder_id, first_day, days):
+        rng = self.random
+        chosen = rng.sample(range(len(SYNTHETIC_MEDICATIONS)), rng.randrange(1, 5))
+        medication_ids = self.insert_returning_ids(Medication, [
+            {
+                'user_id': elder_id,
+                'medication_name': SYNTHETIC_MEDICATIONS[index][0],
+                'dosage': SYNTHETIC_MEDICATIONS[index][1],
+                'frequency': f'{len(self.slots[index])}x daily',
+                'start_date': first_day,
+                'is_active': True
+            }
+            for index in chosen
+        ])
+        # Some elders are less adherent than others
+        taken_rate = rng.uniform(0.75, 0.98)
+        for medication_id, index in zip(medication_ids, chosen):
+            for time_of_day, days_mask in self.slots[index]:
+                self.add(MedicationTimeSlot, {'medication_id': medication_id, 'time_of_day': time_of_day, 'days_mask': days_mask})
+            for offset in range(days):
+                day = first_day + timedelta(days=offset)
+                weekday = 1 << day.weekday()
+                for time_of_day, days_mask in self.slots[index]:
+                    if not days_mask & weekday:
+                        continue
+                    scheduled_time = datetime.combine(day, time_of_day)
+                    roll = rng.random()
+                    if roll < taken_rate:
+                        status, taken_time = 'taken', scheduled_time + timedelta(minutes=rng.randrange(30))
+                    elif roll < taken_rate + 0.03:
+                        status, taken_time = 'late', scheduled_time + timedelta(minutes=90 + rng.randrange(120))
+                    else:
+                        status, taken_time = 'missed', None
+                    self.add(MedicationLog, {
+                        'medication_id': medication_id,
+                        'user_id': elder_id,
+                        'scheduled_time': scheduled_time,
+                        'taken_time': taken_time,
+                        'status': status,
+                        'confirmation_method': 'voice' if status != 'missed' else 'auto'
+                    })
+                    # One rollup row per log: a medication's slots never share an hour
+                    self.add(MedicationAdherenceStats, {
+                        'user_id': elder_id,
+                        'medication_id': medication_id,
+                        'day': day,
+                        'hour': time_of_day.hour,
+                        'log_count': 1,
+                        'taken_count': 1 if status == 'taken' else 0
+                    })
+
+@demo_bp.cli.command('create-user')
+def create_demo_user_command():
+    """Create the demo user (mary@example.com / password123) if it doesn't exist"""
+    user = create_demo_user()
+    click.echo(f'Demo user {user.email} (id {user.id})')
+
+@demo_bp.cli.command('generate')
+@click.option('--caregivers', type=int, default=10, help='Caregiver accounts to create')
+@click.option('--elders-per-caregiver', type=int, default=3, help='Elders per caregiver')
+@click.option('--days', type=int, default=90, help='Days of history per elder')
+@click.option('--heavy-elder-years', type=float, default=0, help='Also create one elder with this many years of dense history')
+@click.option('--seed', type=int, default=0, help='Random seed; the same seed and end date give the same data')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Last day of history (default today)')
+@click.option('--password', default='password123', help='Password for every generated account')
+@click.option('--no-demo', is_flag=True, help="Don't attach the demo user (Mary) to the first caregiver")
+def generate_dataset(caregivers, elders_per_caregiver, days, heavy_elder_years, seed, end_date, password, no_demo):
+    """Bulk-generate synthetic caregivers, elders and their history"""
+    if User.query.filter_by(email=f'caregiver-{seed}-0@example.com').first():
+        raise click.ClickException(f'Data for seed {seed} already exists; use another --seed')
+    started = monotonic()
+    generator = DatasetGenerator(seed, end_date.date() if end_date else None, password)
+    counts = generator.generate(
+        caregivers, elders_per_caregiver, days,
+        heavy_elder_days=int(heavy_elder_years * 365),
+        include_demo=not no_demo
+    )
+    elapsed = monotonic() - started
+    for table, count in sorted(counts.items()):
+        click.echo(f'{table:32} {count:>12,}')
+    total = sum(counts.values())
+    click.echo(f'{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)')
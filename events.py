@@ -0,0 +1,183 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from src.models.user import db
+from src.routes.auth import verify_token, get_cached_users
+from src.routes.metrics import query_budget
+from collections import deque
+import itertools
+import json
+import os
+import queue
+import threading
+import uuid
+
+events_bp = Blueprint('events', __name__)
+
+EVENT_BUFFER_SIZE = int(os.environ.get('EVENT_BUFFER_SIZE', 100))  # per subscriber
+EVENT_HISTORY_SIZE = int(os.environ.get('EVENT_HISTORY_SIZE', 200))  # per caregiver, for resume
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get('EVENT_HEARTBEAT_SECONDS', 15))
+
+class Subscriber:
+    def __init__(self, caregiver_id):
+        self.caregiver_id = caregiver_id
+        self.queue = queue.Queue(maxsize=EVENT_BUFFER_SIZE)
+        self.dropped = False
+
+class EventHub:
+    """In-process publish/subscribe hub for caregiver event streams
+    
+    Events are keyed by caregiver. Each caregiver keeps a short history so
+    reconnecting clients can resume from their last event id, and each
+    subscriber has a bounded buffer: a client that falls behind is dropped
+    rather than letting its backlog grow. Only events published by this
+    process are seen, so streams should be served by the workers that
+    handle writes (or fed from a shared broker in multi-host setups).
+    
+    Event ids are "<epoch>-<n>": the epoch is drawn afresh by every process
+    (including each worker forked from a preloaded app), so an id handed
+    out by another process or before a restart is always recognised, no
+    matter how far the new counter has advanced.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.start_epoch()
+
+    def start_epoch(self):
+        self.pid = os.getpid()
+        self.epoch = uuid.uuid4().hex[:12]
+        self.ids = itertools.count(1)
+        self.last_id = 0
+        self.subscribers = {}
+        self.history = {}
+        self.evicted = {}
+
+    def check_process(self):
+        # Called with the lock held; a forked worker must not reuse its parent's epoch
+        if self.pid != os.getpid():
+            self.start_epoch()
+
+    def parse_event_id(self, event_id):
+        """The counter part of an id from this epoch, else None"""
+        epoch, _, number = event_id.partition('-')
+        return int(number) if epoch == self.epoch and number.isdigit() else None
+
+    def publish(self, caregiver_id, event_type, data):
+        with self.lock:
+            self.check_process()
+            self.last_id = next(self.ids)
+            event = (self.last_id, event_type, data, f'{self.epoch}-{self.last_id}')
+            history = self.history.setdefault(caregiver_id, deque())
+            history.append(event)
+            if len(history) > EVENT_HISTORY_SIZE:
+                self.evicted[caregiver_id] = history.popleft()[0]
+            for subscriber in list(self.subscribers.get(caregiver_id, ())):
+                try:
+                    subscriber.queue.put_nowait(event)
+                except queue.Full:
+                    subscriber.dropped = True
+                    self.subscribers[caregiver_id].discard(subscriber)
+        return event[3]
+
+    def subscribe(self, caregiver_id, last_event_id=None):
+        """Register a subscriber; returns it with any events missed since last_event_id
+        
+        The backlog is None when events after last_event_id have already left
+        the history, or the id comes from another epoch (another process, or
+        before a restart), in which case the client must reload its state.
+        """
+        subscriber = Subscriber(caregiver_id)
+        with self.lock:
+            self.check_process()
+            self.subscribers.setdefault(caregiver_id, set()).add(subscriber)
+            if last_event_id is None:
+                return subscriber, []
+            last_event_id = self.parse_event_id(last_event_id)
+            if last_event_id is None or last_event_id < self.evicted.get(caregiver_id, 0) or last_event_id > self.last_id:
+                return subscriber, None
+            return subscriber, [event for event in self.history.get(caregiver_id, ()) if event[0] > last_event_id]
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.get(subscriber.caregiver_id, set()).discard(subscriber)
+
+event_hub = EventHub()
+
+def publish_for_elders(events):
+    """Publish (elder_id, event_type, data) events to the elders' caregivers, if they have one"""
+    elders = get_cached_users(elder_id for elder_id, _, _ in events) if events else {}
+    for elder_id, event_type, data in events:
+        elder = elders.get(elder_id)
+        if elder and elder.caregiver_id:
+            event_hub.publish(elder.caregiver_id, event_type, data)
+
+def publish_conversations(conversations):
+    """Push concern-flagged messages written by or for an elder"""
+    publish_for_elders([
+        (conv.user_id, 'conversation', conv.to_dict())
+        for conv in conversations if conv.contains_concern and conv.message_type != 'ai'
+    ])
+
+def publish_medication_logs(logs):
+    """Push missed doses"""
+    publish_for_elders([(log.user_id, 'medication_log', log.to_dict()) for log in logs if log.status == 'missed'])
+
+def publish_alerts(alerts):
+    """Push alerts that were raised, refreshed, acknowledged or resolved"""
+    publish_for_elders([(alert.elder_id, 'alert', alert.to_dict()) for alert in alerts])
+
+def format_event(event):
+    _, event_type, data, event_id = event
+    return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+
+@events_bp.route('/caregiver/<int:caregiver_id>/events', methods=['GET'])
+@query_budget(1)
+def caregiver_events(caregiver_id):
+    """Server-sent event stream of conversation, medication and alert activity"""
+    try:
+        token = request.headers.get('Authorization') or request.args.get('token')
+        user = verify_token(token) if token else None
+        
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        # Check if user is the caregiver
+        if user.id != caregiver_id:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        # EventSource sends Last-Event-ID on reconnect; allow a query param for the first connect
+        last_event_id = (request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or '').strip() or None
+        
+        # Don't hold a pooled connection for the lifetime of the stream
+        db.session.close()
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    subscriber, backlog = event_hub.subscribe(caregiver_id, last_event_id)
+
+    def stream():
+        try:
+            yield f'retry: {int(EVENT_HEARTBEAT_SECONDS * 1000)}\n\n'
+            if backlog is None:
+                yield 'event: reset\ndata: {}\n\n'
+            else:
+                for event in backlog:
+                    yield format_event(event)
+            
+            while not subscriber.dropped:
+                try:
+                    event = subscriber.queue.get(timeout=EVENT_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield format_event(event)
+            
+            yield 'event: dropped\ndata: {}\n\n'
+        finally:
+            event_hub.unsubscribe(subscriber)
+    
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,100 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from src.models.user import db, Conversation, Medication, MedicationLog, Appointment, Task, CaregiverReport
+from src.routes.auth import verify_token, get_cached_user
+from src.routes.serialization import (
+    dumps, conversation_rows, medication_rows, medication_log_rows, appointment_rows, task_rows, report_rows
+)
+from src.routes.metrics import query_budget
+import zlib
+
+export_bp = Blueprint('export', __name__)
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+# Bytes buffered before a chunk is sent to the client
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def export_queries(user_id):
+    """(record type, serializer, query) in export order"""
+    return [
+        ('conversation', conversation_rows, db.select(*conversation_rows.columns)
+            .where(Conversation.user_id == user_id)
+            .order_by(Conversation.timestamp, Conversation.id)),
+        ('medication', medication_rows, db.select(*medication_rows.columns)
+            .where(Medication.user_id == user_id)
+            .order_by(Medication.id)),
+        ('medication_log', medication_log_rows, db.select(*medication_log_rows.columns)
+            .where(MedicationLog.user_id == user_id)
+            .order_by(MedicationLog.scheduled_time, MedicationLog.id)),
+        ('appointment', appointment_rows, db.select(*appointment_rows.columns)
+            .where(Appointment.user_id == user_id)
+            .order_by(Appointment.appointment_date, Appointment.appointment_time, Appointment.id)),
+        ('task', task_rows, db.select(*task_rows.columns)
+            .where(Task.user_id == user_id)
+            .order_by(Task.id)),
+        ('caregiver_report', report_rows, db.select(*report_rows.columns)
+            .where(CaregiverReport.elder_id == user_id)
+            .order_by(CaregiverReport.report_date, CaregiverReport.id))
+    ]
+
+def export_lines(user_id):
+    """Yield one encoded NDJSON line per record, streaming column tuples with yield_per"""
+    for record_type, serializer, query in export_queries(user_id):
+        rows = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        # Serialize a batch at a time so child rows (time slots) load with one query per batch
+        for batch in rows.partitions():
+            for data in serializer.to_dicts(batch):
+                yield dumps({'type': record_type, 'data': data}) + b'\n'
+
+def export_chunks(user_id, compress):
+    """Group lines into chunks of about EXPORT_CHUNK_SIZE bytes, gzip-compressed if asked"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer, size = [], 0
+    for line in export_lines(user_id):
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            chunk = b''.join(buffer)
+            yield compressor.compress(chunk) if compressor else chunk
+            buffer, size = [], 0
+    
+    chunk = b''.join(buffer)
+    if compressor:
+        yield compressor.compress(chunk) + compressor.flush()
+    elif chunk:
+        yield chunk
+
+@export_bp.route('/export/<int:user_id>', methods=['GET'])
+@query_budget(2)
+def export_user(user_id):
+    """Stream an elder's full record as NDJSON (format=ndjson) or gzip'd NDJSON (format=ndjson.gz)"""
+    try:
+        token = request.headers.get('Authorization')
+        user = verify_token(token) if token else None
+        
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        elder = get_cached_user(user_id)
+        if not elder:
+            return jsonify({'error': 'User not found'}), 404
+        
+        # Check if user is the elder or their caregiver
+        if user.id != elder.id and user.id != elder.caregiver_id:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'ndjson.gz'):
+            return jsonify({'error': 'format must be ndjson or ndjson.gz'}), 400
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    compress = export_format == 'ndjson.gz'
+    response = Response(
+        stream_with_context(export_chunks(user_id, compress)),
+        mimetype='application/gzip' if compress else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=user-{user_id}-export.{export_format}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
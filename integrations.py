@@ -1,12 +1,13 @@
 from flask import Blueprint, request, jsonify
+from src.routes.metrics import query_budget
 from datetime import datetime, timedelta
 import os
-import requests
 
 integrations_bp = Blueprint('integrations', __name__)
 
 # Uber API Integration Structure
 @integrations_bp.route('/uber/request-ride', methods=['POST'])
+@query_budget(0)
 def request_uber_ride():
     """
     Request an Uber ride for the elder user
@@ -66,6 +67,7 @@ def request_uber_ride():
         return jsonify({'error': str(e)}), 500
 
 @integrations_bp.route('/uber/ride-status/<ride_id>', methods=['GET'])
+@query_budget(0)
 def get_ride_status(ride_id):
     """Get the current status of an Uber ride"""
     try:
@@ -92,6 +94,7 @@ def get_ride_status(ride_id):
 
 # Calendar API Integration Structure
 @integrations_bp.route('/calendar/appointments', methods=['GET'])
+@query_budget(0)
 def get_calendar_appointments():
     """
     Get upcoming appointments from calendar integration
@@ -143,6 +146,7 @@ def get_calendar_appointments():
         return jsonify({'error': str(e)}), 500
 
 @integrations_bp.route('/calendar/create-appointment', methods=['POST'])
+@query_budget(0)
 def create_calendar_appointment():
     """
     Create a new calendar appointment
@@ -194,6 +198,7 @@ def create_calendar_appointment():
 
 # Health Device API Integration Structure
 @integrations_bp.route('/health-devices/vitals/<user_id>', methods=['GET'])
+@query_budget(0)
 def get_health_vitals(user_id):
     """
     Get latest health vitals from connected devices
@@ -257,6 +262,7 @@ def get_health_vitals(user_id):
         return jsonify({'error': str(e)}), 500
 
 @integrations_bp.route('/health-devices/sync/<user_id>', methods=['POST'])
+@query_budget(0)
 def sync_health_devices(user_id):
     """
     Trigger a sync with all connected health devices
@@ -289,6 +295,7 @@ def sync_health_devices(user_id):
 
 # Webhook handlers for external services
 @integrations_bp.route('/webhooks/uber', methods=['POST'])
+@query_budget(0)
 def uber_webhook():
     """Handle webhooks from Uber API for ride status updates"""
     try:
@@ -314,6 +321,7 @@ def uber_webhook():
         return jsonify({'error': str(e)}), 500
 
 @integrations_bp.route('/webhooks/calendar', methods=['POST'])
+@query_budget(0)
 def calendar_webhook():
     """Handle webhooks from calendar services for appointment changes"""
     try:
@@ -336,6 +344,7 @@ def calendar_webhook():
         return jsonify({'error': str(e)}), 500
 
 @integrations_bp.route('/webhooks/health', methods=['POST'])
+@query_budget(0)
 def health_webhook():
     """Handle webhooks from health device APIs for vital sign alerts"""
     try:
@@ -361,6 +370,7 @@ def health_webhook():
 
 # Configuration endpoints
 @integrations_bp.route('/integrations/config', methods=['GET'])
+@query_budget(0)
 def get_integration_config():
     """Get current integration configuration"""
     try:
@@ -388,6 +398,7 @@ def get_integration_config():
         return jsonify({'error': str(e)}), 500
 
 @integrations_bp.route('/integrations/test', methods=['POST'])
+@query_budget(0)
 def test_integrations():
     """Test all configured integrations"""
     try:
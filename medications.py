@@ -1,11 +1,42 @@
 from flask import Blueprint, request, jsonify
-from src.models.user import db, Medication, MedicationLog
-from src.routes.auth import verify_token
+from sqlalchemy import func
+from src.models.user import db, User, Alert, Medication, MedicationLog, MedicationAdherenceStats, MedicationTimeSlot, ResourceVersion, UserDataVersion
+from src.routes.auth import verify_token, get_cached_user
+from src.routes.conditional import is_not_modified, list_validators, not_modified, with_validators
+from src.routes.serialization import json_response, medication_rows
+from src.routes.events import publish_alerts, publish_medication_logs
+from src.routes.schedule import DOSE_GRACE, dose_index, expand_doses, find_dose_log, find_missed_doses, load_dose_logs, unlogged_doses
+from src.routes.metrics import query_budget
 from datetime import datetime, date, timedelta
+from types import SimpleNamespace
+import click
+import json
+import os
 
 medications_bp = Blueprint('medications', __name__)
 
+def medication_compliance(user_id, start, end):
+    """Count logged and taken doses scheduled in [start, end) with one grouped query"""
+    counts = dict(db.session.query(MedicationLog.status, func.count()).filter(
+        MedicationLog.user_id == user_id,
+        MedicationLog.scheduled_time >= start,
+        MedicationLog.scheduled_time < end
+    ).group_by(MedicationLog.status).all())
+    
+    total_scheduled = sum(counts.values())
+    taken = counts.get('taken', 0)
+    compliance_rate = (taken / total_scheduled * 100) if total_scheduled > 0 else 0
+    return total_scheduled, taken, compliance_rate
+
+def breakdown_entry(log_count, taken_count):
+    return {
+        'total_scheduled': log_count,
+        'taken': taken_count,
+        'compliance_rate': round(taken_count / log_count * 100, 2) if log_count else 0
+    }
+
 @medications_bp.route('/medications/<int:user_id>', methods=['GET'])
+@query_budget(4)
 def get_medications(user_id):
     try:
         token = request.headers.get('Authorization')
@@ -18,16 +49,23 @@ def get_medications(user_id):
         if user.id != user_id and user.caregiver_id != user.id:
             return jsonify({'error': 'Access denied'}), 403
         
-        medications = Medication.query.filter_by(user_id=user_id, is_active=True).all()
+        # Answer conditional requests from the version counter, before loading any rows
+        etag, last_modified = list_validators('medications', user_id)
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
         
-        return jsonify({
-            'medications': [med.to_dict() for med in medications]
-        }), 200
+        medications = Medication.query.filter_by(user_id=user_id, is_active=True)\
+            .with_entities(*medication_rows.columns).all()
+        
+        return with_validators(json_response({
+            'medications': medication_rows.to_dicts(medications)
+        }), etag, last_modified), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @medications_bp.route('/medications', methods=['POST'])
+@query_budget(6)
 def create_medication():
     try:
         token = request.headers.get('Authorization')
@@ -56,10 +94,15 @@ def create_medication():
             medication.end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
         
         if 'time_slots' in data:
-            medication.set_time_slots(data['time_slots'])
+            try:
+                medication.set_time_slots(data['time_slots'])
+            except (ValueError, TypeError) as e:
+                return jsonify({'error': f'Invalid time_slots: {e}'}), 400
         
         db.session.add(medication)
+        ResourceVersion.bump('medications', [medication.user_id])
         db.session.commit()
+        dose_index.refresh([medication])
         
         return jsonify({
             'message': 'Medication created successfully',
@@ -70,6 +113,7 @@ def create_medication():
         return jsonify({'error': str(e)}), 500
 
 @medications_bp.route('/medications/<int:medication_id>', methods=['PUT'])
+@query_budget(9)
 def update_medication(medication_id):
     try:
         token = request.headers.get('Authorization')
@@ -96,13 +140,19 @@ def update_medication(medication_id):
         if 'frequency' in data:
             medication.frequency = data['frequency']
         if 'time_slots' in data:
-            medication.set_time_slots(data['time_slots'])
+            try:
+                medication.set_time_slots(data['time_slots'])
+            except (ValueError, TypeError) as e:
+                db.session.rollback()
+                return jsonify({'error': f'Invalid time_slots: {e}'}), 400
         if 'end_date' in data:
             medication.end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
         if 'is_active' in data:
             medication.is_active = data['is_active']
         
+        ResourceVersion.bump('medications', [medication.user_id])
         db.session.commit()
+        dose_index.refresh([medication])
         
         return jsonify({
             'message': 'Medication updated successfully',
@@ -113,6 +163,7 @@ def update_medication(medication_id):
         return jsonify({'error': str(e)}), 500
 
 @medications_bp.route('/medications/<int:medication_id>', methods=['DELETE'])
+@query_budget(5)
 def delete_medication(medication_id):
     try:
         token = request.headers.get('Authorization')
@@ -131,7 +182,9 @@ def delete_medication(medication_id):
         
         # Soft delete by setting is_active to False
         medication.is_active = False
+        ResourceVersion.bump('medications', [medication.user_id])
         db.session.commit()
+        dose_index.refresh([medication])
         
         return jsonify({'message': 'Medication deleted successfully'}), 200
         
@@ -139,6 +192,7 @@ def delete_medication(medication_id):
         return jsonify({'error': str(e)}), 500
 
 @medications_bp.route('/medications/<int:medication_id>/log', methods=['POST'])
+@query_budget(12)
 def log_medication(medication_id):
     try:
         token = request.headers.get('Authorization')
@@ -156,6 +210,8 @@ def log_medication(medication_id):
         # Validate required fields
         if 'status' not in data:
             return jsonify({'error': 'status is required'}), 400
+        if data.get('confirmation_method') == 'auto':
+            return jsonify({'error': "confirmation_method 'auto' is reserved for doses marked missed"}), 400
         
         log = MedicationLog(
             medication_id=medication_id,
@@ -167,7 +223,12 @@ def log_medication(medication_id):
         )
         
         db.session.add(log)
+        MedicationAdherenceStats.record([log], removed=replace_auto_missed([log]))
+        UserDataVersion.bump([log.user_id])
+        alerts = Alert.evaluate_medication_logs([log])
         db.session.commit()
+        publish_medication_logs([log])
+        publish_alerts(alerts)
         
         return jsonify({
             'message': 'Medication log created successfully',
@@ -177,7 +238,384 @@ def log_medication(medication_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Rows accepted by a single bulk request, and rows written per transaction
+MAX_BULK_ROWS = int(os.environ.get('MAX_BULK_ROWS', 100000))
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 5000))
+MAX_BULK_CHUNKS = -(-MAX_BULK_ROWS // BULK_CHUNK_SIZE)
+LOG_STATUSES = ('taken', 'missed', 'late')
+
+def parse_bulk_rows(key):
+    """Read rows from a JSON array, a {key: [...]} object or NDJSON (application/x-ndjson)
+    
+    Returns (rows, error); an NDJSON line that isn't valid JSON becomes a
+    None row so it can be reported in the per-row results.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        rows = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(None)
+    else:
+        data = request.get_json(silent=True)
+        rows = data.get(key) if isinstance(data, dict) else data
+    
+    if not isinstance(rows, list) or not rows:
+        return None, f'{key} must be a non-empty list or NDJSON body'
+    if len(rows) > MAX_BULK_ROWS:
+        return None, f'At most {MAX_BULK_ROWS} rows per request'
+    return rows, None
+
+def chunked(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def can_manage(user, owner_id, owner_caregiver_id):
+    return user.id == owner_id or user.id == owner_caregiver_id
+
+def validate_medication_row(item, default_user_id):
+    if not isinstance(item, dict):
+        raise ValueError('row must be a JSON object')
+    for field in ('medication_name', 'dosage', 'frequency', 'start_date'):
+        if not item.get(field):
+            raise ValueError(f'{field} is required')
+    user_id = item.get('user_id', default_user_id)
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        raise ValueError('user_id must be an integer')
+    return {
+        'user_id': user_id,
+        'medication_name': str(item['medication_name']),
+        'dosage': str(item['dosage']),
+        'frequency': str(item['frequency']),
+        'time_slots': MedicationTimeSlot.parse_all(item.get('time_slots') or []),
+        'start_date': datetime.strptime(item['start_date'], '%Y-%m-%d').date(),
+        'end_date': datetime.strptime(item['end_date'], '%Y-%m-%d').date() if item.get('end_date') else None,
+        'is_active': True
+    }
+
+def validate_log_row(item, now):
+    if not isinstance(item, dict):
+        raise ValueError('row must be a JSON object')
+    if not isinstance(item.get('medication_id'), int):
+        raise ValueError('medication_id is required')
+    if item.get('status') not in LOG_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(LOG_STATUSES)}")
+    if item.get('confirmation_method') == 'auto':
+        raise ValueError("confirmation_method 'auto' is reserved for doses marked missed")
+    taken_time = None
+    if item.get('taken_time'):
+        taken_time = datetime.fromisoformat(item['taken_time'])
+    elif item['status'] == 'taken':
+        taken_time = now
+    return {
+        'medication_id': item['medication_id'],
+        'scheduled_time': datetime.fromisoformat(item['scheduled_time']) if item.get('scheduled_time') else now,
+        'taken_time': taken_time,
+        'status': item['status'],
+        'confirmation_method': item.get('confirmation_method', 'manual')
+    }
+
+def validate_rows(rows, validate, *args):
+    """Validate every row up front; returns the per-row results and the (index, values) accepted"""
+    results = [None] * len(rows)
+    accepted = []
+    for index, item in enumerate(rows):
+        try:
+            accepted.append((index, validate(item, *args)))
+        except (ValueError, TypeError) as e:
+            results[index] = {'index': index, 'error': str(e)}
+    return results, accepted
+
+def bulk_insert(model, accepted, results, after_insert=None):
+    """Insert accepted rows with one executemany per chunk, each chunk in its own transaction
+    
+    Keys that aren't columns of the model's table (e.g. time_slots) are
+    left for after_insert(values, ids), which runs inside the chunk's
+    transaction to write child rows and maintain rollups and alerts, and
+    returns the alerts to publish once committed.
+    A failing chunk is rolled back and its rows reported as errors;
+    chunks already committed are kept.
+    """
+    created = 0
+    for chunk in chunked(accepted):
+        values = [row for _, row in chunk]
+        try:
+            # Core insert so RETURNING is batched (insertmanyvalues) rather than run per row
+            table = model.__table__
+            ids = db.session.scalars(
+                db.insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                [{key: value for key, value in row.items() if key in table.c} for row in values]
+            ).all()
+            UserDataVersion.bump([row['user_id'] for row in values])
+            alerts = after_insert(values, ids) if after_insert else []
+            db.session.flush()
+            # Keep the alerts loaded through the commit rather than reloading each one to publish it
+            for alert in alerts:
+                db.session.expunge(alert)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for index, _ in chunk:
+                results[index] = {'index': index, 'error': str(e)}
+            continue
+        
+        publish_alerts(alerts)
+        for (index, _), row_id in zip(chunk, ids):
+            results[index] = {'index': index, 'id': row_id}
+        created += len(chunk)
+    return created
+
+def record_medications(values, ids):
+    slots = [
+        {'medication_id': medication_id, 'time_of_day': time_of_day, 'days_mask': days_mask}
+        for row, medication_id in zip(values, ids)
+        for time_of_day, days_mask in row['time_slots'].items()
+    ]
+    if slots:
+        db.session.execute(db.insert(MedicationTimeSlot.__table__), slots)
+    ResourceVersion.bump('medications', [row['user_id'] for row in values])
+    return []
+
+def replace_auto_missed(logs):
+    """Delete the auto-missed log of each dose the new logs confirm; returns the deleted rows
+    
+    A dose confirmed after mark-missed ran keeps a single log, the
+    confirmation, rather than counting twice.
+    """
+    logs = [log for log in logs if log.confirmation_method != 'auto']
+    if not logs:
+        return []
+    times = [log.scheduled_time for log in logs]
+    candidates = {}
+    for ids in chunked(list({log.medication_id for log in logs})):
+        rows = db.session.query(
+            MedicationLog.id, MedicationLog.medication_id, MedicationLog.user_id, MedicationLog.scheduled_time, MedicationLog.status
+        ).filter(
+            MedicationLog.confirmation_method == 'auto',
+            MedicationLog.medication_id.in_(ids),
+            MedicationLog.scheduled_time >= min(times) - DOSE_GRACE,
+            MedicationLog.scheduled_time <= max(times) + DOSE_GRACE
+        )
+        for row in rows:
+            candidates.setdefault(row.medication_id, []).append(row)
+    
+    removed = {}
+    for log in logs:
+        for row in candidates.get(log.medication_id, ()):
+            if row.id not in removed and abs(row.scheduled_time - log.scheduled_time) <= DOSE_GRACE:
+                removed[row.id] = row
+                break
+    if removed:
+        db.session.execute(db.delete(MedicationLog.__table__).where(MedicationLog.id.in_(list(removed))))
+    return list(removed.values())
+
+def record_logs(values, ids):
+    # The rollup and alert rules only read attributes; skip building ORM instances
+    logs = [SimpleNamespace(**row) for row in values]
+    MedicationAdherenceStats.record(logs, removed=replace_auto_missed(logs))
+    return Alert.evaluate_medication_logs(logs)
+
+@medications_bp.route('/medications/bulk', methods=['POST'])
+@query_budget(2 + 4 * MAX_BULK_CHUNKS, repeats=MAX_BULK_CHUNKS)
+def bulk_create_medications():
+    """Create many medications, e.g. from a pharmacy feed
+    
+    Accepts {"medications": [...]}, a bare JSON array, or NDJSON with one
+    medication per line, each shaped like the POST /medications payload.
+    `user_id` defaults to the caller; other users must be elders the caller
+    cares for. Results are returned per row, in input order.
+    """
+    try:
+        token = request.headers.get('Authorization')
+        user = verify_token(token) if token else None
+        
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        rows, error = parse_bulk_rows('medications')
+        if error:
+            return jsonify({'error': error}), 400
+        
+        results, accepted = validate_rows(rows, validate_medication_row, user.id)
+        
+        # Resolve every target user in one query
+        owner_ids = {row['user_id'] for _, row in accepted}
+        owners = dict(db.session.query(User.id, User.caregiver_id).filter(User.id.in_(owner_ids)).all())
+        
+        allowed = []
+        for index, row in accepted:
+            if row['user_id'] not in owners:
+                results[index] = {'index': index, 'error': 'User not found'}
+            elif not can_manage(user, row['user_id'], owners[row['user_id']]):
+                results[index] = {'index': index, 'error': 'Access denied'}
+            else:
+                allowed.append((index, row))
+        
+        created = bulk_insert(Medication, allowed, results, after_insert=record_medications)
+        if created:
+            dose_index.invalidate()
+        
+        return jsonify({
+            'results': results,
+            'created': created,
+            'failed': len(rows) - created
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@medications_bp.route('/medications/logs/bulk', methods=['POST'])
+@query_budget(2 + 9 * MAX_BULK_CHUNKS, repeats=MAX_BULK_CHUNKS)
+def bulk_log_medications():
+    """Record many dose logs at once
+    
+    Accepts {"logs": [...]}, a bare JSON array, or NDJSON with one log per
+    line: {"medication_id": 1, "status": "taken", "scheduled_time": "...",
+    "taken_time": "...", "confirmation_method": "..."}. Adherence stats and
+    missed-dose alerts are updated as for single logs; per-log missed-dose
+    events are not streamed, only the resulting alerts.
+    """
+    try:
+        token = request.headers.get('Authorization')
+        user = verify_token(token) if token else None
+        
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        rows, error = parse_bulk_rows('logs')
+        if error:
+            return jsonify({'error': error}), 400
+        
+        results, accepted = validate_rows(rows, validate_log_row, datetime.utcnow())
+        
+        # Resolve every medication and its owner in as few queries as possible
+        medication_ids = list({row['medication_id'] for _, row in accepted})
+        medications = {}
+        for ids in chunked(medication_ids):
+            medications.update({
+                medication_id: (owner_id, caregiver_id)
+                for medication_id, owner_id, caregiver_id in db.session.query(
+                    Medication.id, Medication.user_id, User.caregiver_id
+                ).join(User, User.id == Medication.user_id).filter(Medication.id.in_(ids))
+            })
+        
+        allowed = []
+        for index, row in accepted:
+            owner = medications.get(row['medication_id'])
+            if not owner:
+                results[index] = {'index': index, 'error': 'Medication not found'}
+            elif not can_manage(user, *owner):
+                results[index] = {'index': index, 'error': 'Access denied'}
+            else:
+                row['user_id'] = owner[0]
+                allowed.append((index, row))
+        
+        created = bulk_insert(MedicationLog, allowed, results, after_insert=record_logs)
+        
+        return jsonify({
+            'results': results,
+            'created': created,
+            'failed': len(rows) - created
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Longest window a single schedule request may expand
+MAX_SCHEDULE_DAYS = 31
+
+@medications_bp.route('/medications/<int:user_id>/schedule', methods=['GET'])
+@query_budget(5)
+def get_medication_schedule(user_id):
+    """Concrete doses for a user's active medications, with the status of their logs
+    
+    Query params: start (YYYY-MM-DD, default today in UTC, the clock dose
+    times use) and days (default 1).
+    Doses without a log are 'pending' until their grace window closes and
+    'missed' after it.
+    """
+    try:
+        token = request.headers.get('Authorization')
+        user = verify_token(token) if token else None
+        
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        elder = get_cached_user(user_id)
+        if not elder:
+            return jsonify({'error': 'User not found'}), 404
+        
+        # Check if user is the elder or their caregiver
+        if user.id != elder.id and user.id != elder.caregiver_id:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        try:
+            start_day = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args else datetime.utcnow().date()
+        except ValueError:
+            return jsonify({'error': 'start must be a date (YYYY-MM-DD)'}), 400
+        days = min(max(request.args.get('days', 1, type=int), 1), MAX_SCHEDULE_DAYS)
+        start = datetime.combine(start_day, datetime.min.time())
+        end = start + timedelta(days=days)
+        
+        medications = Medication.query.filter_by(user_id=user_id, is_active=True).all()
+        logs = load_dose_logs([user_id], start, end)
+        now = datetime.utcnow()
+        
+        doses = []
+        for medication in medications:
+            for dose in expand_doses(medication, start, end):
+                status = find_dose_log(logs, medication.id, dose)
+                if status is None:
+                    status = 'missed' if dose + DOSE_GRACE < now else 'pending'
+                doses.append({
+                    'medication_id': medication.id,
+                    'medication_name': medication.medication_name,
+                    'dosage': medication.dosage,
+                    'scheduled_time': dose.isoformat(),
+                    'status': status
+                })
+        doses.sort(key=lambda dose: (dose['scheduled_time'], dose['medication_id']))
+        
+        return jsonify({
+            'doses': doses,
+            'date_range': {
+                'start': start_day.isoformat(),
+                'end': (end.date() - timedelta(days=1)).isoformat()
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@medications_bp.route('/medications/due', methods=['GET'])
+@query_budget(4)
+def get_due_doses():
+    """Unlogged doses due within ?minutes= (default 30) for the caller and the elders they care for"""
+    try:
+        token = request.headers.get('Authorization')
+        user = verify_token(token) if token else None
+        
+        if not user:
+            return jsonify({'error': 'Authentication required'}), 401
+        
+        minutes = min(max(request.args.get('minutes', 30, type=int), 0), 24 * 60)
+        user_ids = {user.id} | {elder_id for elder_id, in db.session.query(User.id).filter_by(caregiver_id=user.id)}
+        doses = unlogged_doses(dose_index.due_within(minutes, user_ids=user_ids))
+        
+        return jsonify({
+            'doses': [dict(dose, scheduled_time=dose['scheduled_time'].isoformat()) for dose in doses]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @medications_bp.route('/medications/<int:user_id>/compliance', methods=['GET'])
+@query_budget(4)
 def get_medication_compliance(user_id):
     try:
         token = request.headers.get('Authorization')
@@ -195,15 +633,33 @@ def get_medication_compliance(user_id):
         end_date = date.today()
         start_date = end_date - timedelta(days=days)
         
-        logs = MedicationLog.query.filter(
-            MedicationLog.user_id == user_id,
-            MedicationLog.scheduled_time >= start_date,
-            MedicationLog.scheduled_time <= end_date
-        ).all()
+        total_scheduled, taken, compliance_rate = medication_compliance(
+            user_id, start_date, end_date + timedelta(days=1)
+        )
         
-        total_scheduled = len(logs)
-        taken = len([log for log in logs if log.status == 'taken'])
-        compliance_rate = (taken / total_scheduled * 100) if total_scheduled > 0 else 0
+        # Per-medication and per-hour breakdowns from the adherence rollup
+        stats_window = [
+            MedicationAdherenceStats.user_id == user_id,
+            MedicationAdherenceStats.day >= start_date,
+            MedicationAdherenceStats.day <= end_date
+        ]
+        by_medication = db.session.query(
+            MedicationAdherenceStats.medication_id,
+            Medication.medication_name,
+            func.sum(MedicationAdherenceStats.log_count),
+            func.sum(MedicationAdherenceStats.taken_count)
+        ).join(Medication, Medication.id == MedicationAdherenceStats.medication_id)\
+            .filter(*stats_window)\
+            .group_by(MedicationAdherenceStats.medication_id, Medication.medication_name)\
+            .order_by(MedicationAdherenceStats.medication_id).all()
+        
+        by_hour = db.session.query(
+            MedicationAdherenceStats.hour,
+            func.sum(MedicationAdherenceStats.log_count),
+            func.sum(MedicationAdherenceStats.taken_count)
+        ).filter(*stats_window)\
+            .group_by(MedicationAdherenceStats.hour)\
+            .order_by(MedicationAdherenceStats.hour).all()
         
         return jsonify({
             'compliance': {
@@ -211,6 +667,14 @@ def get_medication_compliance(user_id):
                 'taken': taken,
                 'missed': total_scheduled - taken,
                 'compliance_rate': round(compliance_rate, 2),
+                'by_medication': [
+                    dict(medication_id=medication_id, medication_name=name, **breakdown_entry(logged, taken_count))
+                    for medication_id, name, logged, taken_count in by_medication
+                ],
+                'by_hour': [
+                    dict(hour=hour, **breakdown_entry(logged, taken_count))
+                    for hour, logged, taken_count in by_hour
+                ],
                 'date_range': {
                     'start': start_date.isoformat(),
                     'end': end_date.isoformat()
@@ -221,3 +685,85 @@ def get_medication_compliance(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@medications_bp.cli.command('rebuild-stats')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user')
+def rebuild_medication_stats(user_id):
+    """Rebuild the medication adherence rollup from existing dose logs"""
+    MedicationAdherenceStats.rebuild(user_id)
+    db.session.commit()
+    click.echo('Medication adherence stats rebuilt')
+
+@medications_bp.cli.command('mark-missed')
+@click.option('--minutes', type=int, default=15, help='How far back to look for doses whose grace window closed')
+def mark_missed_doses(minutes):
+    """Log doses that passed their grace window unlogged as missed; run from cron every few minutes"""
+    rows = find_missed_doses(datetime.utcnow(), timedelta(minutes=minutes))
+    created = 0
+    for chunk in chunked(rows):
+        # A dose an overlapping run already marked is skipped by the unique index, not logged twice
+        inserted = MedicationLog.insert_missed(chunk)
+        chunk = [row for row in chunk if (row['medication_id'], row['scheduled_time']) in inserted]
+        if not chunk:
+            continue
+        UserDataVersion.bump([row['user_id'] for row in chunk])
+        alerts = record_logs(chunk, None)
+        db.session.flush()
+        for alert in alerts:
+            db.session.expunge(alert)
+        db.session.commit()
+        publish_alerts(alerts)
+        created += len(chunk)
+    click.echo(f'{created} missed dose(s) logged')
+
+@medications_bp.cli.command('due')
+@click.option('--minutes', type=int, default=30, help='Look-ahead window')
+def list_due_doses(minutes):
+    """Print unlogged doses due across all users within the next N minutes"""
+    for dose in unlogged_doses(dose_index.due_within(minutes)):
+        click.echo(f"{dose['scheduled_time'].isoformat()}  user {dose['user_id']}  {dose['medication_name']} {dose['dosage']}")
+
+@medications_bp.cli.command('migrate-time-slots')
+def migrate_time_slots():
+    """Copy time slots from the legacy medication.time_slots JSON column into medication_time_slot rows
+    
+    The legacy value is cleared in the same transaction, so a re-run only
+    sees medications whose time_slots could not be read. Medications that
+    already have slot rows keep them and just have the legacy value cleared.
+    """
+    if 'time_slots' not in {column['name'] for column in db.inspect(db.engine).get_columns('medication')}:
+        click.echo('No legacy time_slots column; nothing to migrate')
+        return
+    migrated = {medication_id for medication_id, in db.session.query(MedicationTimeSlot.medication_id).distinct()}
+    legacy = db.session.execute(db.text(
+        'SELECT id, user_id, time_slots FROM medication WHERE time_slots IS NOT NULL'
+    )).all()
+    
+    slots, cleared, owners, count, skipped = [], [], set(), 0, 0
+    for medication_id, user_id, time_slots in legacy:
+        if medication_id in migrated:
+            cleared.append(medication_id)
+            continue
+        try:
+            parsed = MedicationTimeSlot.parse_all(json.loads(time_slots) or [])
+        except (ValueError, TypeError) as e:
+            click.echo(f'Medication {medication_id}: cannot migrate time_slots {time_slots!r}: {e}', err=True)
+            skipped += 1
+            continue
+        slots.extend(
+            {'medication_id': medication_id, 'time_of_day': time_of_day, 'days_mask': days_mask}
+            for time_of_day, days_mask in parsed.items()
+        )
+        cleared.append(medication_id)
+        owners.add(user_id)
+        count += 1
+    for chunk in chunked(slots):
+        db.session.execute(db.insert(MedicationTimeSlot.__table__), chunk)
+    clear = db.text('UPDATE medication SET time_slots = NULL WHERE id IN :ids').bindparams(db.bindparam('ids', expanding=True))
+    for chunk in chunked(cleared, 1000):
+        db.session.execute(clear, {'ids': chunk})
+    if owners:
+        ResourceVersion.bump('medications', owners)
+        UserDataVersion.bump(owners)
+    db.session.commit()
+    dose_index.invalidate()
+    click.echo(f'{count} medication(s) migrated, {skipped} skipped with unreadable time_slots')
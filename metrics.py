@@ -0,0 +1,304 @@
+from flask import Blueprint, Response, current_app, request
+from sqlalchemy import event
+from src.models.user import db
+from bisect import bisect_left
+from time import perf_counter
+import os
+import threading
+import traceback
+
+metrics_bp = Blueprint('metrics', __name__)
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+# Bearer token required to read /api/metrics; unset leaves it open (e.g. behind a private network)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Log requests slower than this, with their SQL; 0 disables the slow request log
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 0))
+SLOW_REQUEST_MAX_STATEMENTS = 50
+# Enforcement of declared query budgets: 'off', 'warn' (log with a stack trace, for staging)
+# or 'raise' (fail the request with QueryBudgetExceeded, for tests)
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'off')
+# With budgets on, the same statement run this many times in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+
+# Histogram bucket upper bounds (the Prometheus le labels)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two additions"""
+    __slots__ = ('bounds', 'counts', 'total')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def render(self, name, labels):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += self.counts[-1]
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.total}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+class EndpointMetrics:
+    __slots__ = ('responses', 'duration', 'sql_statements', 'sql_duration', 'response_size')
+
+    def __init__(self):
+        self.responses = {}
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.sql_statements = Histogram(SQL_COUNT_BUCKETS)
+        self.sql_duration = Histogram(DURATION_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+
+class RequestMetrics:
+    """Per-endpoint request histograms for this process
+    
+    Each worker process keeps its own figures, labelled with its pid so
+    series from different workers are never mixed up.
+    """
+
+    HISTOGRAMS = [
+        ('http_request_duration_seconds', 'duration', 'Time to produce the response (headers, for streamed responses)'),
+        ('http_request_sql_statements', 'sql_statements', 'SQL statements executed per request'),
+        ('http_request_sql_duration_seconds', 'sql_duration', 'Time spent in SQL per request'),
+        ('http_response_size_bytes', 'response_size', 'Response body size, when known up front')
+    ]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def observe(self, endpoint, method, status, duration, statements, sql_duration, size):
+        with self.lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = EndpointMetrics()
+            key = (method, status)
+            metrics.responses[key] = metrics.responses.get(key, 0) + 1
+            metrics.duration.observe(duration)
+            metrics.sql_statements.observe(statements)
+            metrics.sql_duration.observe(sql_duration)
+            if size is not None:
+                metrics.response_size.observe(size)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        # Read at render time: workers forked from a preloaded app share the import
+        pid = os.getpid()
+        lines = [
+            '# HELP http_requests_total Requests handled, by endpoint, method and status',
+            '# TYPE http_requests_total counter'
+        ]
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            for endpoint, metrics in endpoints:
+                for (method, status), count in sorted(metrics.responses.items()):
+                    lines.append(
+                        f'http_requests_total{{pid="{pid}",endpoint="{endpoint}",method="{method}",status="{status}"}} {count}'
+                    )
+            for name, attribute, description in self.HISTOGRAMS:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for endpoint, metrics in endpoints:
+                    lines.extend(getattr(metrics, attribute).render(name, f'pid="{pid}",endpoint="{endpoint}"'))
+        return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics()
+
+# Functions adding lines to /api/metrics, e.g. cache counters; each gets the pid label and returns lines
+collectors = []
+
+def register_collector(collect):
+    collectors.append(collect)
+    return collect
+
+def render_metrics():
+    labels = f'pid="{os.getpid()}"'
+    lines = [line for collect in collectors for line in collect(labels)]
+    return request_metrics.render() + ''.join(line + '\n' for line in lines)
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+class RequestTracker:
+    __slots__ = (
+        'started', 'statements', 'sql_duration', 'sql_started', 'context', 'log',
+        'budget', 'repeat_limit', 'repeated', 'problems'
+    )
+
+    def __init__(self, keep_statements, budget=None, repeat_limit=None):
+        self.started = perf_counter()
+        self.statements = 0
+        self.sql_duration = 0.0
+        self.sql_started = None
+        self.context = None
+        self.log = [] if keep_statements else None
+        # Only tracked while budgets are enforced
+        self.budget = budget
+        self.repeat_limit = repeat_limit or N_PLUS_ONE_THRESHOLD
+        self.repeated = {} if QUERY_BUDGET_MODE != 'off' else None
+        self.problems = []
+
+# The request being handled by this thread, if any; SQL outside requests (CLI, jobs) isn't tracked
+current = threading.local()
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tracker = getattr(current, 'tracker', None)
+    if tracker is not None:
+        tracker.sql_started = perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tracker = getattr(current, 'tracker', None)
+    if tracker is None or tracker.sql_started is None:
+        return
+    elapsed = perf_counter() - tracker.sql_started
+    tracker.sql_duration += elapsed
+    # An executemany INSERT ... RETURNING can reach the cursor as several batches sharing one
+    # context (one per row where the dialect can't batch it, as on SQLite); it's still one statement
+    if executemany and context is tracker.context:
+        return
+    tracker.context = context
+    tracker.statements += 1
+    if tracker.log is not None and len(tracker.log) < SLOW_REQUEST_MAX_STATEMENTS:
+        tracker.log.append((elapsed, statement))
+    if tracker.repeated is not None:
+        check_budget(tracker, statement)
+
+def check_budget(tracker, statement):
+    """Note the first statement over budget, and statements repeated often enough to look like an N+1"""
+    if tracker.budget is not None and tracker.statements == tracker.budget + 1:
+        tracker.problems.append(
+            f'Query budget of {tracker.budget} exceeded by: {" ".join(statement.split())[:300]}\n{app_stack()}'
+        )
+    count = tracker.repeated.get(statement, 0) + 1
+    tracker.repeated[statement] = count
+    if count == tracker.repeat_limit:
+        tracker.problems.append(
+            f'Possible N+1: statement run {count} times: {" ".join(statement.split())[:300]}\n{app_stack()}'
+        )
+
+def app_stack():
+    """The current stack without library frames, i.e. the application code that issued the query"""
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if 'site-packages' not in frame.filename and os.sep + 'lib' + os.sep + 'python' not in frame.filename
+    ]
+    return ''.join(traceback.format_list(frames))
+
+def report_query_problems(tracker, where):
+    problems, tracker.problems = tracker.problems, []
+    if not problems or QUERY_BUDGET_MODE == 'off':
+        return
+    message = f'{where}: {tracker.statements} SQL statement(s)\n' + '\n'.join(problems)
+    if QUERY_BUDGET_MODE == 'raise':
+        raise QueryBudgetExceeded(message)
+    current_app.logger.warning(message)
+
+class query_budget:
+    """Cap the SQL statements of a view (as a decorator) or of a block (as a context manager)
+    
+    As a decorator it only records the budget on the view, so put it below
+    the route decorator; it is enforced per request when QUERY_BUDGET_MODE
+    is 'warn' or 'raise'. As a context manager it counts the statements
+    run inside the block, in or outside a request.
+    `repeats` is how often one statement may legitimately run, e.g. once
+    per chunk of a bulk write, before it is reported as an N+1.
+    """
+
+    def __init__(self, limit, repeats=None):
+        self.limit = limit
+        self.repeat_limit = repeats + 1 if repeats else None
+
+    def __call__(self, view):
+        view.query_budget = self
+        return view
+
+    def __enter__(self):
+        tracker = getattr(current, 'tracker', None)
+        self.owned = tracker is None
+        if self.owned:
+            tracker = current.tracker = RequestTracker(keep_statements=False)
+        self.tracker = tracker
+        self.outer = (tracker.budget, tracker.repeat_limit)
+        self.start = tracker.statements
+        budget = self.start + self.limit
+        tracker.budget = budget if tracker.budget is None else min(budget, tracker.budget)
+        tracker.repeat_limit = max(tracker.repeat_limit, self.repeat_limit or 0)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        tracker = self.tracker
+        tracker.budget, tracker.repeat_limit = self.outer
+        if self.owned:
+            current.tracker = None
+        if exc_type is None:
+            report_query_problems(tracker, f'Block with a budget of {self.limit} ran {tracker.statements - self.start}')
+
+def start_request():
+    budget = None
+    if QUERY_BUDGET_MODE != 'off':
+        budget = getattr(current_app.view_functions.get(request.endpoint), 'query_budget', None)
+    current.tracker = RequestTracker(
+        keep_statements=SLOW_REQUEST_MS > 0,
+        budget=budget.limit if budget else None,
+        repeat_limit=budget.repeat_limit if budget else None
+    )
+
+def finish_request(response):
+    tracker = getattr(current, 'tracker', None)
+    if tracker is None:
+        return response
+    current.tracker = None
+    duration = perf_counter() - tracker.started
+    if METRICS_ENABLED:
+        request_metrics.observe(
+            request.endpoint or 'unmatched',
+            request.method,
+            response.status_code,
+            duration,
+            tracker.statements,
+            tracker.sql_duration,
+            None if response.is_streamed else response.calculate_content_length()
+        )
+    if SLOW_REQUEST_MS and duration * 1000 >= SLOW_REQUEST_MS:
+        log_slow_request(tracker, response, duration)
+    report_query_problems(tracker, f'{request.method} {request.full_path.rstrip("?")} ({request.endpoint})')
+    return response
+
+def log_slow_request(tracker, response, duration):
+    lines = [
+        f'Slow request: {request.method} {request.full_path.rstrip("?")} -> {response.status_code} '
+        f'in {duration * 1000:.1f}ms, {tracker.statements} SQL statement(s) taking {tracker.sql_duration * 1000:.1f}ms'
+    ]
+    for elapsed, statement in tracker.log:
+        lines.append(f'  {elapsed * 1000:8.2f}ms  {" ".join(statement.split())[:500]}')
+    if tracker.statements > len(tracker.log):
+        lines.append(f'  ... {tracker.statements - len(tracker.log)} more')
+    current_app.logger.warning('\n'.join(lines))
+
+def init_metrics(app):
+    """Time every request and count its SQL; call once the database is configured"""
+    if not METRICS_ENABLED and QUERY_BUDGET_MODE == 'off':
+        return
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+    app.before_request(start_request)
+    app.after_request(finish_request)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+@query_budget(0)
+def get_metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return Response('Authentication required\n', status=401, mimetype='text/plain')
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,301 @@
+from flask import Blueprint
+from sqlalchemy import or_
+from src.models.user import db, Alert, Appointment, Conversation, ConversationDailyStats, Medication, ResourceVersion, UserDataVersion
+from src.routes.events import publish_alerts
+from src.routes.schedule import expand_doses, find_dose_log, load_dose_logs
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+from zoneinfo import ZoneInfo
+import click
+import heapq
+import itertools
+import os
+import threading
+
+reminders_bp = Blueprint('reminders', __name__)
+
+# Minutes before an appointment to remind the elder, e.g. "1440,60" for a day and an hour ahead
+REMINDER_LEAD_MINUTES = sorted(
+    {int(value) for value in os.environ.get('REMINDER_LEAD_MINUTES', '1440,60').split(',') if value.strip()},
+    reverse=True
+)
+DOSE_REMINDER_LEAD = timedelta(minutes=int(os.environ.get('DOSE_REMINDER_LEAD_MINUTES', 0)))
+# Reminders due this far ahead are held in memory; the window is reloaded every sync
+REMINDER_WINDOW = timedelta(hours=int(os.environ.get('REMINDER_WINDOW_HOURS', 26)))
+# How often to reload the window, picking up appointments and medications edited elsewhere
+REMINDER_SYNC_SECONDS = int(os.environ.get('REMINDER_SYNC_SECONDS', 60))
+# A failed sync or send is retried after REMINDER_RETRY_SECONDS, doubling up to REMINDER_RETRY_MAX_SECONDS;
+# a reminder is dropped after REMINDER_MAX_ATTEMPTS failed sends
+REMINDER_RETRY_SECONDS = int(os.environ.get('REMINDER_RETRY_SECONDS', 30))
+REMINDER_RETRY_MAX_SECONDS = int(os.environ.get('REMINDER_RETRY_MAX_SECONDS', 900))
+REMINDER_MAX_ATTEMPTS = int(os.environ.get('REMINDER_MAX_ATTEMPTS', 6))
+# Timezone of appointment dates and times, e.g. America/Chicago; defaults to the server's local time.
+# Reminders are queued in UTC, like dose times and conversation timestamps.
+APPOINTMENT_TIMEZONE = ZoneInfo(os.environ['APPOINTMENT_TIMEZONE']) if os.environ.get('APPOINTMENT_TIMEZONE') else None
+
+class ReminderQueue:
+    """Min-heap of reminders keyed by what they are for
+    
+    schedule() is O(log n) and replaces any pending reminder with the same
+    key; cancel() is O(1), leaving the superseded heap entry to be skipped
+    when it surfaces.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.heap = []
+        self.pending = {}
+        self.sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def schedule(self, key, fire_at, payload):
+        with self.lock:
+            current = self.pending.get(key)
+            if current and current[0] == fire_at:
+                return
+            entry = (fire_at, next(self.sequence), key, payload)
+            self.pending[key] = entry
+            heapq.heappush(self.heap, entry)
+
+    def cancel(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def keys(self):
+        with self.lock:
+            return list(self.pending)
+
+    def next_fire_at(self):
+        with self.lock:
+            while self.heap and self.pending.get(self.heap[0][2]) is not self.heap[0]:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """Remove and return (key, payload) for every live reminder due at or before now"""
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                entry = heapq.heappop(self.heap)
+                if self.pending.get(entry[2]) is entry:
+                    del self.pending[entry[2]]
+                    due.append((entry[2], entry[3]))
+        return due
+
+def appointment_start(appointment):
+    """UTC start of an appointment, whose date and time are local to APPOINTMENT_TIMEZONE"""
+    local = datetime.combine(appointment.appointment_date, appointment.appointment_time)
+    local = local.replace(tzinfo=APPOINTMENT_TIMEZONE) if APPOINTMENT_TIMEZONE else local.astimezone()
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+def appointment_date(utc):
+    """Date in APPOINTMENT_TIMEZONE at a naive UTC time"""
+    return utc.replace(tzinfo=timezone.utc).astimezone(APPOINTMENT_TIMEZONE).date()
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(REMINDER_RETRY_SECONDS * 2 ** (attempts - 1), REMINDER_RETRY_MAX_SECONDS))
+
+def appointment_reminder_text(appointment):
+    text = f"Reminder: {appointment.title} on {appointment.appointment_date.strftime('%A, %B %d')} at {appointment.appointment_time.strftime('%H:%M')}"
+    if appointment.doctor_name:
+        text += f' with {appointment.doctor_name}'
+    if appointment.location:
+        text += f' at {appointment.location}'
+    return text + '.'
+
+def dose_reminder_text(medication_name, dosage):
+    return f"It's time to take your {medication_name} ({dosage})."
+
+class ReminderService:
+    """Fires appointment and dose reminders as system messages in the elder's conversation
+    
+    Only reminders due within REMINDER_WINDOW are held, so a restart just
+    reloads that window. Each sync diffs the window against the queue:
+    edited appointments are rescheduled and deleted or cancelled ones are
+    dropped. Reminders are checked against the database again when they
+    fire, so anything edited since the last sync is never sent stale.
+    Failed sends are queued again with a backoff. Run exactly one instance
+    (flask reminders run).
+    """
+
+    def __init__(self):
+        self.queue = ReminderQueue()
+        # key -> failed sends, for reminders waiting to be retried
+        self.attempts = {}
+
+    def desired_reminders(self, now):
+        """{key: (fire_at, payload)} for every reminder due in the window"""
+        horizon = now + REMINDER_WINDOW
+        max_lead = timedelta(minutes=REMINDER_LEAD_MINUTES[0]) if REMINDER_LEAD_MINUTES else timedelta(0)
+        reminders = {}
+        
+        # Plain column rows: the window can hold a very large number of appointments
+        appointments = db.session.query(
+            Appointment.id, Appointment.appointment_date, Appointment.appointment_time, Appointment.reminder_sent
+        ).filter(
+            Appointment.appointment_date >= appointment_date(now),
+            Appointment.appointment_date <= appointment_date(horizon + max_lead),
+            Appointment.status == 'scheduled'
+        )
+        leads = [timedelta(minutes=lead) for lead in REMINDER_LEAD_MINUTES]
+        for appointment in appointments:
+            starts_at = appointment_start(appointment)
+            if starts_at <= now:
+                continue
+            fire_times = [starts_at - lead for lead in leads]
+            upcoming = [fire_at for fire_at in fire_times if now <= fire_at <= horizon]
+            # Catch up once if every lead time passed before the appointment was loaded
+            if not appointment.reminder_sent and fire_times and all(fire_at < now for fire_at in fire_times):
+                # One stable key, so a catch-up waiting on a retry isn't queued again by the next sync
+                reminders[('appointment', appointment.id, 'catch-up')] = (now, (appointment.id, starts_at))
+            for fire_at in upcoming:
+                reminders[('appointment', appointment.id, fire_at)] = (fire_at, (appointment.id, starts_at))
+        
+        medications = Medication.query.filter(
+            Medication.is_active == True,
+            Medication.start_date <= (horizon + DOSE_REMINDER_LEAD).date(),
+            or_(Medication.end_date == None, Medication.end_date >= now.date())
+        ).all()
+        for medication in medications:
+            for dose in expand_doses(medication, now + DOSE_REMINDER_LEAD, horizon + DOSE_REMINDER_LEAD):
+                reminders[('dose', medication.id, dose)] = (
+                    dose - DOSE_REMINDER_LEAD,
+                    (medication.id, medication.user_id, dose, medication.medication_name, medication.dosage)
+                )
+        return reminders
+
+    def sync(self, now):
+        desired = self.desired_reminders(now)
+        db.session.rollback()
+        # Reminders waiting on a retry keep their backoff, even once they leave the window
+        for key in self.queue.keys():
+            if key not in desired and key not in self.attempts:
+                self.queue.cancel(key)
+        for key, (fire_at, payload) in desired.items():
+            if key not in self.attempts:
+                self.queue.schedule(key, fire_at, payload)
+
+    def fire(self, due, now):
+        """Send due reminders in one transaction; returns the number sent"""
+        appointment_reminders = [payload for key, payload in due if key[0] == 'appointment']
+        dose_reminders = [payload for key, payload in due if key[0] == 'dose']
+        messages, alerts, reminded = [], [], []
+        
+        if appointment_reminders:
+            appointments = {
+                appointment.id: appointment
+                for appointment in Appointment.query.filter(
+                    Appointment.id.in_({appointment_id for appointment_id, _ in appointment_reminders})
+                )
+            }
+            for appointment_id, starts_at in appointment_reminders:
+                appointment = appointments.get(appointment_id)
+                # Skip reminders for appointments moved, cancelled or deleted since the last sync
+                if not appointment or appointment.status != 'scheduled' or appointment_start(appointment) != starts_at:
+                    continue
+                messages.append(Conversation(
+                    user_id=appointment.user_id,
+                    message_text=appointment_reminder_text(appointment),
+                    message_type='system',
+                    timestamp=now
+                ))
+                appointment.reminder_sent = True
+                reminded.append(appointment.user_id)
+                alerts.extend(Alert.evaluate_appointment(appointment))
+        
+        if dose_reminders:
+            active = {
+                medication_id for medication_id, in db.session.query(Medication.id).filter(
+                    Medication.id.in_({reminder[0] for reminder in dose_reminders}),
+                    Medication.is_active == True
+                )
+            }
+            doses = [reminder[2] for reminder in dose_reminders]
+            logs = load_dose_logs({reminder[1] for reminder in dose_reminders}, min(doses), max(doses) + timedelta(seconds=1))
+            for medication_id, user_id, dose, medication_name, dosage in dose_reminders:
+                # Skip doses already logged (e.g. taken early) or medications stopped since the last sync
+                if medication_id not in active or find_dose_log(logs, medication_id, dose) is not None:
+                    continue
+                messages.append(Conversation(
+                    user_id=user_id,
+                    message_text=dose_reminder_text(medication_name, dosage),
+                    message_type='system',
+                    timestamp=now
+                ))
+        
+        if messages:
+            db.session.add_all(messages)
+            ConversationDailyStats.record(messages)
+            UserDataVersion.bump([message.user_id for message in messages])
+            ResourceVersion.bump('conversations', [message.user_id for message in messages])
+        if reminded:
+            ResourceVersion.bump('appointments', reminded)
+        db.session.commit()
+        publish_alerts(alerts)
+        return len(messages)
+
+    def run_once(self, now=None):
+        """Load the window and send everything due now; returns the number sent"""
+        now = now or datetime.utcnow()
+        self.sync(now)
+        return self.fire(self.queue.pop_due(now), now)
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        next_sync = monotonic()
+        sync_failures = 0
+        while not stop.is_set():
+            if monotonic() >= next_sync:
+                try:
+                    self.sync(datetime.utcnow())
+                    sync_failures = 0
+                    next_sync = monotonic() + REMINDER_SYNC_SECONDS
+                except Exception as e:
+                    # e.g. "database is locked"; keep sending what is queued and sync again later
+                    db.session.rollback()
+                    sync_failures += 1
+                    next_sync = monotonic() + retry_delay(sync_failures).total_seconds()
+                    click.echo(f'Syncing reminders failed: {e}', err=True)
+            
+            now = datetime.utcnow()
+            due = self.queue.pop_due(now)
+            if due:
+                try:
+                    self.fire(due, now)
+                    for key, _ in due:
+                        self.attempts.pop(key, None)
+                except Exception as e:
+                    db.session.rollback()
+                    click.echo(f'Sending {len(due)} reminder(s) failed: {e}', err=True)
+                    self.retry(due, now)
+            
+            # Sleep until the next reminder or sync, whichever comes first
+            wait = next_sync - monotonic()
+            next_fire_at = self.queue.next_fire_at()
+            if next_fire_at is not None:
+                wait = min(wait, (next_fire_at - datetime.utcnow()).total_seconds())
+            stop.wait(max(wait, 0))
+
+    def retry(self, due, now):
+        """Queue failed reminders again after a backoff, dropping those out of attempts"""
+        for key, payload in due:
+            attempts = self.attempts.get(key, 0) + 1
+            if attempts >= REMINDER_MAX_ATTEMPTS:
+                self.attempts.pop(key, None)
+                click.echo(f'Dropping reminder {key} after {attempts} failed attempts', err=True)
+                continue
+            self.attempts[key] = attempts
+            self.queue.schedule(key, now + retry_delay(attempts), payload)
+
+@reminders_bp.cli.command('run')
+@click.option('--once', is_flag=True, help='Send what is due now and exit, e.g. from cron')
+def run_reminders(once):
+    """Run the reminder service; keep a single instance running"""
+    service = ReminderService()
+    if once:
+        click.echo(f'{service.run_once()} reminder(s) sent')
+        return
+    click.echo('Reminder service started')
+    service.run()
@@ -0,0 +1,287 @@
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from src.models.user import db, Medication, MedicationLog, MedicationTimeSlot
+from datetime import datetime, timedelta
+from time import monotonic
+from bisect import bisect_left
+import heapq
+import itertools
+import os
+import threading
+
+# How long after its scheduled time a dose stays due before it counts as missed.
+# A log within this distance of a dose counts for it, so keep it under half the gap between slots.
+DOSE_GRACE = timedelta(minutes=int(os.environ.get('DOSE_GRACE_MINUTES', 60)))
+# The index only sees this process's medication writes; reload to pick up other workers'
+DOSE_INDEX_RELOAD_SECONDS = int(os.environ.get('DOSE_INDEX_RELOAD_SECONDS', 300))
+# Users per IN (...) when looking up dose logs
+LOG_LOOKUP_CHUNK = 500
+
+def slot_times(medication):
+    """Sorted (time_of_day, days_mask) pairs of a medication's time slots"""
+    return [(slot.time_of_day, slot.days_mask) for slot in medication.slots]
+
+def expand_doses(medication, start, end=None):
+    """Lazily yield a medication's scheduled dose times in [start, end), in order
+    
+    Doses fall on every time slot of every day from start_date through
+    end_date, skipping weekdays outside a slot's days_mask. With no end
+    (and no end_date) the sequence is open-ended.
+    """
+    # Read the medication now so the generator doesn't touch a detached instance later
+    slots = slot_times(medication)
+    first_day = max(start.date(), medication.start_date)
+    last_day = medication.end_date
+    if end is not None:
+        last_day = min(last_day, end.date()) if last_day else end.date()
+    return iter_doses(slots, first_day, last_day, start, end)
+
+def iter_doses(slots, day, last_day, start, end):
+    if not slots:
+        return
+    while last_day is None or day <= last_day:
+        weekday = 1 << day.weekday()
+        for slot, days_mask in slots:
+            if not days_mask & weekday:
+                continue
+            dose = datetime.combine(day, slot)
+            if end is not None and dose >= end:
+                return
+            if dose >= start:
+                yield dose
+        day += timedelta(days=1)
+
+def load_dose_logs(user_ids, start, end):
+    """{medication_id: sorted [(scheduled_time, status)]} for logs within the grace window of [start, end)"""
+    logs = {}
+    user_ids = list(user_ids)
+    for offset in range(0, len(user_ids), LOG_LOOKUP_CHUNK):
+        rows = db.session.query(MedicationLog.medication_id, MedicationLog.scheduled_time, MedicationLog.status).filter(
+            MedicationLog.user_id.in_(user_ids[offset:offset + LOG_LOOKUP_CHUNK]),
+            MedicationLog.scheduled_time >= start - DOSE_GRACE,
+            MedicationLog.scheduled_time < end + DOSE_GRACE
+        )
+        for medication_id, scheduled_time, status in rows:
+            logs.setdefault(medication_id, []).append((scheduled_time, status))
+    for entries in logs.values():
+        entries.sort()
+    return logs
+
+def find_dose_log(logs, medication_id, dose):
+    """The status of the first log within DOSE_GRACE of a dose, or None if it wasn't logged"""
+    entries = logs.get(medication_id, ())
+    index = bisect_left(entries, (dose - DOSE_GRACE,))
+    if index < len(entries) and entries[index][0] <= dose + DOSE_GRACE:
+        return entries[index][1]
+    return None
+
+def find_missed_doses(now, lookback):
+    """Dose log rows for unlogged doses whose grace window closed in the last `lookback`"""
+    end = now - DOSE_GRACE
+    start = end - lookback
+    medications = Medication.query.filter(
+        Medication.is_active == True,
+        Medication.start_date <= end.date(),
+        or_(Medication.end_date == None, Medication.end_date >= start.date())
+    )
+    if lookback < timedelta(days=1):
+        # Only medications with a slot in the window's time of day, via the time_of_day index
+        medication_ids = MedicationTimeSlot.medications_due_between(start.time(), end.time())
+        medications = medications.filter(Medication.id.in_(medication_ids))
+    medications = medications.all()
+    doses = [(medication, dose) for medication in medications for dose in expand_doses(medication, start, end)]
+    if not doses:
+        return []
+    
+    logs = load_dose_logs({medication.user_id for medication, _ in doses}, start, end)
+    return [
+        {
+            'medication_id': medication.id,
+            'user_id': medication.user_id,
+            'scheduled_time': dose,
+            'taken_time': None,
+            'status': 'missed',
+            'confirmation_method': 'auto'
+        }
+        for medication, dose in doses
+        if find_dose_log(logs, medication.id, dose) is None
+    ]
+
+class DoseChain:
+    """The not-yet-expired doses of one medication, materialized one at a time"""
+    def __init__(self, medication, generation, start):
+        self.user_id = medication.user_id
+        self.medication_name = medication.medication_name
+        self.dosage = medication.dosage
+        self.generation = generation
+        self.doses = expand_doses(medication, start)
+        self.frontier = None
+
+    def advance(self):
+        self.frontier = next(self.doses, None)
+        return self.frontier
+
+class DoseIndex:
+    """Fleet-wide min-heap of upcoming doses across all active medications
+    
+    Each medication contributes its next dose; popping a medication's
+    latest materialized dose pushes the one after it, so answering "what is
+    due in the next N minutes" touches only the doses in that window.
+    Entries are invalidated lazily by bumping the medication's generation.
+    The index is process-local: it follows this process's medication writes
+    through refresh() and reloads every DOSE_INDEX_RELOAD_SECONDS. Only the
+    first load blocks callers; later reloads are built in a background
+    thread while the current heap keeps answering.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Serializes reloads, which build the new heap without holding self.lock
+        self.reload_lock = threading.Lock()
+        self.generations = itertools.count()
+        self.heap = []
+        self.chains = {}
+        self.loaded_at = None
+        self.invalidations = 0
+        # Ids of medications refreshed while a reload is building, else None
+        self.refreshed_during_reload = None
+
+    def is_fresh(self):
+        return self.loaded_at is not None and monotonic() - self.loaded_at <= DOSE_INDEX_RELOAD_SECONDS
+
+    def build(self, now):
+        """(heap, chains) for every active medication, read from the database"""
+        heap, chains = [], {}
+        # One joined query; the slots' default selectin loading costs a statement per 500 medications
+        for medication in Medication.query.options(joinedload(Medication.slots)).filter_by(is_active=True).all():
+            chain = DoseChain(medication, next(self.generations), now - DOSE_GRACE)
+            chains[medication.id] = chain
+            if chain.advance():
+                heap.append((chain.frontier, medication.id, chain.generation))
+        heapq.heapify(heap)
+        return heap, chains
+
+    def load(self, now):
+        """Rebuild the index unless another thread just did, then swap it in"""
+        with self.reload_lock:
+            with self.lock:
+                if self.is_fresh():
+                    return
+                self.refreshed_during_reload = set()
+                invalidations = self.invalidations
+            try:
+                heap, chains = self.build(now)
+            finally:
+                with self.lock:
+                    refreshed, self.refreshed_during_reload = self.refreshed_during_reload, None
+            with self.lock:
+                # The build may predate these medications' latest writes; keep what refresh() made of them
+                if refreshed:
+                    for medication_id in refreshed:
+                        chains.pop(medication_id, None)
+                        if medication_id in self.chains:
+                            chains[medication_id] = self.chains[medication_id]
+                    heap.extend(entry for entry in self.heap if entry[1] in refreshed)
+                    heapq.heapify(heap)
+                self.heap, self.chains = heap, chains
+                # An invalidate() during the build means it may have missed the bulk write; reload again next time
+                self.loaded_at = monotonic() if self.invalidations == invalidations else None
+
+    def reload_in_background(self):
+        if self.reload_lock.locked():
+            return
+        app = current_app._get_current_object()
+        threading.Thread(target=self.background_reload, args=(app,), daemon=True).start()
+
+    def background_reload(self, app):
+        with app.app_context():
+            try:
+                self.load(datetime.utcnow())
+            except Exception:
+                # The current heap stays in use; the next due_within() retries
+                app.logger.exception('Dose index reload failed')
+
+    def add(self, medication, start):
+        chain = DoseChain(medication, next(self.generations), start)
+        self.chains[medication.id] = chain
+        if chain.advance():
+            heapq.heappush(self.heap, (chain.frontier, medication.id, chain.generation))
+
+    def invalidate(self):
+        """Force a full reload on next use, e.g. after a bulk import"""
+        with self.lock:
+            self.loaded_at = None
+            self.invalidations += 1
+
+    def refresh(self, medications):
+        """Re-expand medications after they were created, changed or deactivated"""
+        now = datetime.utcnow()
+        with self.lock:
+            if self.loaded_at is None and self.refreshed_during_reload is None:
+                return
+            for medication in medications:
+                if self.refreshed_during_reload is not None:
+                    self.refreshed_during_reload.add(medication.id)
+                self.chains.pop(medication.id, None)
+                if medication.is_active:
+                    self.add(medication, now - DOSE_GRACE)
+
+    def take(self, entry):
+        """Account for a popped entry; returns its chain, or None if the entry is stale"""
+        due, medication_id, generation = entry
+        chain = self.chains.get(medication_id)
+        if chain is None or chain.generation != generation:
+            return None
+        if due == chain.frontier and chain.advance():
+            heapq.heappush(self.heap, (chain.frontier, medication_id, generation))
+        return chain
+
+    def due_within(self, minutes, now=None, user_ids=None):
+        """Doses scheduled up to `minutes` from now that are still inside their grace window
+        
+        Optionally restricted to a set of user ids. Logged doses are not
+        excluded here; see unlogged_doses().
+        """
+        now = now or datetime.utcnow()
+        horizon = now + timedelta(minutes=minutes)
+        with self.lock:
+            loaded, fresh = self.loaded_at is not None, self.is_fresh()
+        if not loaded:
+            self.load(now)
+        elif not fresh:
+            self.reload_in_background()
+        
+        with self.lock:
+            # Drop doses whose grace window has passed
+            while self.heap and self.heap[0][0] < now - DOSE_GRACE:
+                self.take(heapq.heappop(self.heap))
+            
+            due, popped = [], []
+            while self.heap and self.heap[0][0] <= horizon:
+                entry = heapq.heappop(self.heap)
+                chain = self.take(entry)
+                if chain is None:
+                    continue
+                popped.append(entry)
+                if user_ids is None or chain.user_id in user_ids:
+                    due.append({
+                        'medication_id': entry[1],
+                        'user_id': chain.user_id,
+                        'medication_name': chain.medication_name,
+                        'dosage': chain.dosage,
+                        'scheduled_time': entry[0]
+                    })
+            for entry in popped:
+                heapq.heappush(self.heap, entry)
+        return due
+
+dose_index = DoseIndex()
+
+def unlogged_doses(doses):
+    """Filter index results down to doses that have no log yet, with one log query"""
+    if not doses:
+        return []
+    times = [dose['scheduled_time'] for dose in doses]
+    logs = load_dose_logs({dose['user_id'] for dose in doses}, min(times), max(times) + timedelta(seconds=1))
+    return [dose for dose in doses if find_dose_log(logs, dose['medication_id'], dose['scheduled_time']) is None]
@@ -0,0 +1,94 @@
+from flask import Response
+from src.models.user import Conversation, Medication, MedicationLog, MedicationTimeSlot, Appointment, Task, CaregiverReport
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder produces the same JSON, only slower
+    orjson = None
+
+def iso_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def dumps(payload):
+    """Encode to compact JSON bytes with sorted keys (like jsonify); dates and times become ISO 8601"""
+    if orjson:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), default=iso_default).encode()
+
+def loads(text):
+    return orjson.loads(text) if orjson else json.loads(text)
+
+def json_response(payload):
+    return Response(dumps(payload), mimetype='application/json')
+
+class RowSerializer:
+    """Column-level list path: select only these columns and build to_dict()-shaped dicts from the tuples
+    
+    Skips hydrating model instances. Dates and times are left as objects
+    for dumps() to encode; `decoders` convert stored JSON text columns.
+    `related` maps a key to (loader, default) for values kept in child
+    tables: loader(ids) returns {id: value} for a whole batch of rows in
+    one query, keyed by the first column (the primary key).
+    """
+
+    def __init__(self, *columns, decoders=None, related=None):
+        self.columns = columns
+        self.keys = tuple(column.key for column in columns)
+        decoders = decoders or {}
+        self.decoders = [(index, decoders[key]) for index, key in enumerate(self.keys) if key in decoders]
+        self.related = related or {}
+
+    def to_dict(self, row):
+        return self.to_dicts([row])[0]
+
+    def to_dicts(self, rows):
+        if not self.decoders:
+            keys = self.keys
+            dicts = [dict(zip(keys, row)) for row in rows]
+        else:
+            dicts = [self.decode(row) for row in rows]
+        if self.related and dicts:
+            ids = [row[0] for row in rows]
+            for key, (loader, default) in self.related.items():
+                values = loader(ids)
+                for data, row_id in zip(dicts, ids):
+                    data[key] = values.get(row_id, default())
+        return dicts
+
+    def decode(self, row):
+        values = list(row)
+        for index, decode in self.decoders:
+            values[index] = decode(values[index])
+        return dict(zip(self.keys, values))
+
+conversation_rows = RowSerializer(
+    Conversation.id, Conversation.user_id, Conversation.message_text, Conversation.message_type,
+    Conversation.timestamp, Conversation.mood_score, Conversation.contains_concern
+)
+medication_rows = RowSerializer(
+    Medication.id, Medication.user_id, Medication.medication_name, Medication.dosage, Medication.frequency,
+    Medication.start_date, Medication.end_date, Medication.is_active,
+    related={'time_slots': (MedicationTimeSlot.for_medications, list)}
+)
+medication_log_rows = RowSerializer(
+    MedicationLog.id, MedicationLog.medication_id, MedicationLog.user_id, MedicationLog.scheduled_time,
+    MedicationLog.taken_time, MedicationLog.status, MedicationLog.confirmation_method
+)
+appointment_rows = RowSerializer(
+    Appointment.id, Appointment.user_id, Appointment.title, Appointment.description,
+    Appointment.appointment_date, Appointment.appointment_time, Appointment.location,
+    Appointment.doctor_name, Appointment.appointment_type, Appointment.status, Appointment.reminder_sent
+)
+task_rows = RowSerializer(
+    Task.id, Task.user_id, Task.task_description, Task.due_date, Task.due_time,
+    Task.priority, Task.status, Task.category
+)
+report_rows = RowSerializer(
+    CaregiverReport.id, CaregiverReport.elder_id, CaregiverReport.caregiver_id, CaregiverReport.report_date,
+    CaregiverReport.mood_summary, CaregiverReport.medication_compliance, CaregiverReport.appointment_attendance,
+    CaregiverReport.concerns_raised, CaregiverReport.ai_insights,
+    decoders={'ai_insights': lambda text: loads(text) if text else {}}
+)
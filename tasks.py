@@ -1,11 +1,15 @@
 from flask import Blueprint, request, jsonify
-from src.models.user import db, Task
+from src.models.user import db, ResourceVersion, Task
 from src.routes.auth import verify_token
+from src.routes.conditional import is_not_modified, list_validators, not_modified, with_validators
+from src.routes.serialization import json_response, task_rows
+from src.routes.metrics import query_budget
 from datetime import datetime, date
 
 tasks_bp = Blueprint('tasks', __name__)
 
 @tasks_bp.route('/tasks/<int:user_id>', methods=['GET'])
+@query_budget(3)
 def get_tasks(user_id):
     try:
         token = request.headers.get('Authorization')
@@ -18,6 +22,11 @@ def get_tasks(user_id):
         if user.id != user_id and user.caregiver_id != user.id:
             return jsonify({'error': 'Access denied'}), 403
         
+        # Answer conditional requests from the version counter, before loading any rows
+        etag, last_modified = list_validators('tasks', user_id)
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+        
         # Get query parameters
         status = request.args.get('status')
         category = request.args.get('category')
@@ -32,16 +41,17 @@ def get_tasks(user_id):
         if priority:
             query = query.filter_by(priority=priority)
         
-        tasks = query.order_by(Task.due_date, Task.due_time).all()
+        tasks = query.order_by(Task.due_date, Task.due_time).with_entities(*task_rows.columns).all()
         
-        return jsonify({
-            'tasks': [task.to_dict() for task in tasks]
-        }), 200
+        return with_validators(json_response({
+            'tasks': task_rows.to_dicts(tasks)
+        }), etag, last_modified), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @tasks_bp.route('/tasks', methods=['POST'])
+@query_budget(4)
 def create_task():
     try:
         token = request.headers.get('Authorization')
@@ -70,6 +80,7 @@ def create_task():
             task.due_time = datetime.strptime(data['due_time'], '%H:%M').time()
         
         db.session.add(task)
+        ResourceVersion.bump('tasks', [task.user_id])
         db.session.commit()
         
         return jsonify({
@@ -81,6 +92,7 @@ def create_task():
         return jsonify({'error': str(e)}), 500
 
 @tasks_bp.route('/tasks/<int:task_id>', methods=['PUT'])
+@query_budget(5)
 def update_task(task_id):
     try:
         token = request.headers.get('Authorization')
@@ -113,6 +125,7 @@ def update_task(task_id):
         if 'category' in data:
             task.category = data['category']
         
+        ResourceVersion.bump('tasks', [task.user_id])
         db.session.commit()
         
         return jsonify({
@@ -124,6 +137,7 @@ def update_task(task_id):
         return jsonify({'error': str(e)}), 500
 
 @tasks_bp.route('/tasks/<int:task_id>', methods=['DELETE'])
+@query_budget(4)
 def delete_task(task_id):
     try:
         token = request.headers.get('Authorization')
@@ -141,6 +155,7 @@ def delete_task(task_id):
             return jsonify({'error': 'Access denied'}), 403
         
         db.session.delete(task)
+        ResourceVersion.bump('tasks', [task.user_id])
         db.session.commit()
         
         return jsonify({'message': 'Task deleted successfully'}), 200
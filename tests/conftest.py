@@ -0,0 +1,4 @@
+import os
+import sys
+# Tests import the app as src.*, like the benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,19 @@
+import pytest
+
+from src.main import create_app, init_database
+
+@pytest.mark.parametrize('database_url', [
+    'sqlite://',
+    'sqlite:///:memory:',
+    'sqlite:///file::memory:?cache=shared&uri=true'
+])
+def test_in_memory_sqlite_in_production_profile(database_url):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'DB_ENGINE_PROFILE': 'production'})
+    assert 'pool_size' not in app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    with app.app_context():
+        init_database()
+    assert app.test_client().get('/api/health').status_code == 200
+
+def test_file_sqlite_gets_pool_options(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}", 'DB_ENGINE_PROFILE': 'production'})
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'] > 0
@@ -0,0 +1,202 @@
+"""Every API route stays within the SQL statement budget declared with @query_budget
+
+A module fixture generates caregivers and elders with history in a
+temporary SQLite file and calls every route for two elders with
+QUERY_BUDGET_MODE=raise, first with the in-process caches emptied before
+each call and then warm. Each route then gets its own test: it must
+declare a budget, be exercised, succeed, stay within the budget and show
+no N+1 pattern.
+"""
+import json
+from datetime import date, datetime, timedelta
+
+import jwt
+import pytest
+
+from src.main import create_app, init_database
+
+CAREGIVERS = 3
+ELDERS_PER_CAREGIVER = 4
+DAYS = 45
+
+# Listed from a throwaway app so each route gets its own test id
+ENDPOINTS = sorted(
+    endpoint for endpoint in create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}).view_functions
+    if endpoint != 'static'
+)
+
+def calls(ids):
+    """(method, path, body, sender) for every route, in an order where created ids exist when used"""
+    caregiver, elder = ids['caregiver'], ids['elder']
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    return [
+        ('GET', '/', None, None),
+        ('GET', '/api/health', None, None),
+        ('GET', '/api/metrics', None, None),
+        ('POST', '/api/demo/setup', {}, None),
+        ('POST', '/api/auth/register', {'email': f"audit-{ids['run']}@example.com", 'password': 'pw', 'full_name': 'Audit User'}, None),
+        ('POST', '/api/auth/login', {'email': ids['caregiver_email'], 'password': 'password123'}, None),
+        ('GET', '/api/auth/profile', None, 'elder'),
+        ('POST', '/api/auth/logout', {}, 'elder'),
+
+        ('POST', '/api/conversations', {'message_text': 'Hello there', 'message_type': 'user'}, 'elder'),
+        ('GET', f'/api/conversations/{elder}', None, 'elder'),
+        ('GET', f'/api/conversations/{elder}/summary', None, 'elder'),
+        ('POST', '/api/ai/chat', {'message': 'I feel a bit dizzy today'}, 'elder'),
+        ('POST', '/api/ai/chat/batch', {'messages': [
+            {'message': message, 'user_id': user_id} for user_id in ids['elders'] for message in ('Good morning', 'I feel dizzy and sad')
+        ]}, 'caregiver'),
+        ('POST', '/api/ai/proactive-check', {}, 'elder'),
+        ('POST', '/api/ai/transcribe', {'duration': 4}, 'elder'),
+        ('GET', f'/api/ai/mood-analysis/{elder}', None, 'elder'),
+
+        ('GET', f'/api/medications/{elder}', None, 'elder'),
+        ('POST', '/api/medications', {'medication_name': 'Aspirin', 'dosage': '81mg', 'frequency': 'daily',
+                                      'start_date': '2026-01-01', 'time_slots': ['08:00', '20:00']}, 'elder'),
+        ('PUT', '/api/medications/{medication}', {'dosage': '100mg', 'time_slots': ['09:00']}, 'elder'),
+        ('POST', '/api/medications/{medication}/log', {'status': 'missed'}, 'elder'),
+        ('GET', f'/api/medications/{elder}/compliance', None, 'elder'),
+        ('GET', f'/api/medications/{elder}/schedule', None, 'caregiver'),
+        ('GET', '/api/medications/due?minutes=120', None, 'caregiver'),
+        ('POST', '/api/medications/bulk', {'medications': [
+            {'medication_name': name, 'dosage': '10mg', 'frequency': 'daily', 'start_date': '2026-01-01', 'time_slots': ['12:00'], 'user_id': user_id}
+            for user_id in ids['elders'] for name in ('Vitamin C', 'Zinc')
+        ]}, 'caregiver'),
+        ('POST', '/api/medications/logs/bulk', {'logs': [
+            {'medication_id': '{medication}', 'status': status} for status in ('taken', 'missed', 'late') * 3
+        ]}, 'elder'),
+        ('DELETE', '/api/medications/{medication}', None, 'elder'),
+
+        ('GET', f'/api/appointments/{elder}', None, 'elder'),
+        ('GET', f'/api/appointments/{elder}/upcoming', None, 'elder'),
+        ('POST', '/api/appointments', {'title': 'Dentist', 'appointment_date': tomorrow, 'appointment_time': '10:30'}, 'elder'),
+        ('PUT', '/api/appointments/{appointment}', {'appointment_time': '11:00'}, 'elder'),
+        ('DELETE', '/api/appointments/{appointment}', None, 'elder'),
+
+        ('GET', f'/api/tasks/{elder}', None, 'elder'),
+        ('POST', '/api/tasks', {'task_description': 'Water the plants', 'due_date': tomorrow}, 'elder'),
+        ('PUT', '/api/tasks/{task}', {'status': 'completed'}, 'elder'),
+        ('DELETE', '/api/tasks/{task}', None, 'elder'),
+
+        ('GET', f'/api/caregiver/{caregiver}/elders', None, 'caregiver'),
+        ('GET', f'/api/caregiver/{caregiver}/overview', None, 'caregiver'),
+        ('GET', f'/api/caregiver/{elder}/dashboard', None, 'caregiver'),
+        ('GET', f'/api/caregiver/{elder}/alerts', None, 'caregiver'),
+        ('GET', f'/api/caregiver/{elder}/reports', None, 'caregiver'),
+        ('POST', '/api/caregiver/reports', {'elder_id': elder, 'mood_summary': 'Stable', 'ai_insights': {'trend': 'stable'}}, 'caregiver'),
+        ('POST', '/api/caregiver/alerts/{alert}/acknowledge', {}, 'caregiver'),
+        ('GET', f'/api/caregiver/{caregiver}/events', None, 'caregiver'),
+        ('GET', f'/api/export/{elder}', None, 'caregiver'),
+
+        ('GET', '/api/integrations/config', None, None),
+        ('POST', '/api/integrations/test', {}, None),
+        ('POST', '/api/uber/request-ride', {'user_id': elder, 'pickup_address': '1 Main St', 'destination_address': '2 Oak Ave'}, None),
+        ('GET', '/api/uber/ride-status/ride_1', None, None),
+        ('GET', f'/api/calendar/appointments?user_id={elder}', None, None),
+        ('POST', '/api/calendar/create-appointment', {'user_id': elder, 'title': 'Checkup', 'start_time': '2026-10-20T10:00:00Z',
+                                                      'end_time': '2026-10-20T11:00:00Z'}, None),
+        ('GET', f'/api/health-devices/vitals/{elder}', None, None),
+        ('POST', f'/api/health-devices/sync/{elder}', {}, None),
+        ('POST', '/api/webhooks/uber', {'ride_id': 'ride_1', 'status': 'arriving'}, None),
+        ('POST', '/api/webhooks/calendar', {'appointment_id': 'cal_1', 'change_type': 'updated'}, None),
+        ('POST', '/api/webhooks/health', {'user_id': elder, 'alert_type': 'high', 'vital_sign': 'heart_rate', 'value': 120}, None)
+    ]
+
+def fill(value, created):
+    """Substitute ids created by earlier calls ({medication}, {appointment}, ...) into paths and bodies"""
+    if isinstance(value, str):
+        if value.startswith('{') and value.endswith('}') and value[1:-1] in created:
+            return created[value[1:-1]]
+        return value.format(**created) if '{' in value else value
+    if isinstance(value, dict):
+        return {key: fill(item, created) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, created) for item in value]
+    return value
+
+@pytest.fixture(scope='module')
+def audit(tmp_path_factory):
+    """(app, {endpoint: most statements used}, {endpoint: [failures]}) after calling every route"""
+    from src.models.user import db, User, Alert
+    from src.routes import auth, metrics
+    from src.routes.caregiver import dashboard_cache
+    from src.routes.demo import DatasetGenerator
+    from src.routes.schedule import dose_index
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(metrics, 'QUERY_BUDGET_MODE', 'raise')
+        monkeypatch.setattr(auth.password_pool, 'workers', 0)
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path_factory.mktemp('audit') / 'audit.db'}",
+            'TESTING': True
+        })
+        with app.app_context():
+            init_database()
+            DatasetGenerator(seed=0).generate(CAREGIVERS, ELDERS_PER_CAREGIVER, DAYS, include_demo=False)
+            caregiver = User.query.filter_by(is_elder=False).order_by(User.id).first()
+            elders = [elder.id for elder in User.query.filter_by(caregiver_id=caregiver.id).order_by(User.id)]
+            caregiver_id, caregiver_email = caregiver.id, caregiver.email
+
+        # Read from the request's own tracker, so statements are counted exactly as budgets count them
+        statements = {}
+
+        @app.after_request
+        def record(response):
+            statements['used'] = metrics.current.tracker.statements
+            return response
+
+        client = app.test_client()
+        expires = datetime.utcnow() + timedelta(hours=1)
+        token = lambda user_id: {'Authorization': 'Bearer ' + jwt.encode({'user_id': user_id, 'exp': expires}, auth.SECRET_KEY, algorithm='HS256')}
+        used, failures = {}, {}
+
+        # Two elders cold (every in-process cache emptied before each call), then the same two warm
+        for run, elder in enumerate(elders[:2] * 2):
+            cold = run < 2
+            ids = {'caregiver': caregiver_id, 'elder': elder, 'elders': elders, 'caregiver_email': caregiver_email, 'run': run}
+            created = {}
+            for method, path, body, sender in calls(ids):
+                with app.app_context():
+                    created['alert'] = db.session.query(Alert.id).filter_by(elder_id=elder).order_by(Alert.id.desc()).limit(1).scalar() or 0
+                if cold:
+                    for cache in (auth.token_cache, auth.user_cache, dashboard_cache):
+                        cache.clear()
+                    dose_index.invalidate()
+                path, body = fill(path, created), fill(body, created)
+                headers = token(elder if sender == 'elder' else caregiver_id) if sender else {}
+                endpoint = app.url_map.bind('localhost').match(path.split('?')[0], method=method)[0]
+
+                statements.clear()
+                try:
+                    response = client.open(path, method=method, json=body, headers=headers)
+                    status = response.status_code
+                    # The event stream never ends; anything else is read to the end
+                    payload = None
+                    if response.mimetype != 'text/event-stream':
+                        response.get_data()
+                        payload = response.get_json(silent=True)
+                    response.close()
+                except metrics.QueryBudgetExceeded as e:
+                    failures.setdefault(endpoint, []).append(str(e))
+                    continue
+                # The single page app isn't built in a bare checkout
+                if status >= 400 and not (endpoint == 'serve' and status == 404):
+                    failures.setdefault(endpoint, []).append(f'{method} {path} returned {status}: {json.dumps(payload)[:200]}')
+                used[endpoint] = max(used.get(endpoint, 0), statements['used'])
+
+                for key in ('medication', 'appointment', 'task'):
+                    if method == 'POST' and path == f'/api/{key}s' and status == 201:
+                        created[key] = payload[key]['id']
+
+        yield app, used, failures
+        with app.app_context():
+            db.engine.dispose()
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_route_within_query_budget(audit, endpoint):
+    app, used, failures = audit
+    budget = getattr(app.view_functions[endpoint], 'query_budget', None)
+    assert budget is not None, f'{endpoint} declares no query budget'
+    assert not failures.get(endpoint), '\n\n'.join(failures[endpoint])
+    assert endpoint in used, f'{endpoint} was not exercised'
+    assert used[endpoint] <= budget.limit, f'{endpoint} used {used[endpoint]} statements, budget {budget.limit}'
@@ -1,10 +1,53 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy import case, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime, date, time, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
+import functools
 import json
+import os
+import re
 
 db = SQLAlchemy()
 
+# Hash parameters for new and upgraded passwords, e.g. scrypt:32768:8:1 or pbkdf2:sha256:1000000;
+# defaults to werkzeug's own method (scrypt)
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+# Stored hashes are only ever upgraded: to a stronger algorithm, or to a higher cost of the same one
+PASSWORD_HASH_ALGORITHM_RANK = {'pbkdf2': 1, 'scrypt': 2}
+
+@functools.lru_cache(maxsize=None)
+def password_hash_prefix():
+    """Full method prefix of new hashes, e.g. 'scrypt:32768:8:1' for PASSWORD_HASH_METHOD=scrypt
+    
+    Shorthand methods only get their parameters filled in by werkzeug, so
+    hash a dummy value once per process rather than at import.
+    """
+    return generate_password_hash('', method=PASSWORD_HASH_METHOD).split('$', 1)[0]
+
+def password_hash_strength(prefix):
+    method, *params = prefix.split(':')
+    return PASSWORD_HASH_ALGORITHM_RANK.get(method, 0), [int(param) for param in params if param.isdigit()]
+
+# An acknowledged alert suppresses new alerts of the same kind for this long
+ALERT_COOLDOWN = timedelta(minutes=int(os.environ.get('ALERT_COOLDOWN_MINUTES', 60)))
+LOW_MOOD_THRESHOLD = 4
+
+def upsert_increment(model, rows, key_columns, counter_columns, replace_columns=()):
+    """Insert rollup rows, adding their counters to any existing row with the same key
+    
+    replace_columns are overwritten with the new row's values instead.
+    """
+    insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    stmt = insert(model)
+    set_ = {
+        column: getattr(model, column) + getattr(stmt.excluded, column)
+        for column in counter_columns
+    }
+    set_.update({column: getattr(stmt.excluded, column) for column in replace_columns})
+    stmt = stmt.on_conflict_do_update(index_elements=key_columns, set_=set_)
+    db.session.execute(stmt, rows)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -26,11 +69,15 @@ class User(db.Model):
     tasks = db.relationship('Task', backref='user', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def password_needs_rehash(self):
+        stored = password_hash_strength(self.password_hash.split('$', 1)[0])
+        return stored < password_hash_strength(password_hash_prefix())
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -44,11 +91,61 @@ class User(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+class UserDataVersion(db.Model):
+    """Per-user counter bumped by every write to conversations, dose logs or appointments
+    
+    Lets readers such as the caregiver dashboard tell whether anything
+    changed with a single primary-key lookup.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def bump(cls, user_ids):
+        upsert_increment(cls, [{'user_id': user_id, 'version': 1} for user_id in set(user_ids)], ['user_id'], ['version'])
+
+    @classmethod
+    def current(cls, user_id):
+        return db.session.query(cls.version).filter_by(user_id=user_id).scalar() or 0
+
+class ResourceVersion(db.Model):
+    """Per-user, per-resource change counter behind conditional GETs on list endpoints
+    
+    resource is one of 'conversations', 'medications', 'appointments' or
+    'tasks'; every write to a user's rows of that kind bumps it.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    resource = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    modified_at = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def bump(cls, resource, user_ids):
+        now = datetime.utcnow()
+        upsert_increment(
+            cls,
+            [{'user_id': user_id, 'resource': resource, 'version': 1, 'modified_at': now} for user_id in set(user_ids)],
+            ['user_id', 'resource'],
+            ['version'],
+            replace_columns=['modified_at']
+        )
+
+    @classmethod
+    def current(cls, resource, user_id):
+        """(version, modified_at); (0, None) if the user's rows were never written through the API"""
+        row = db.session.query(cls.version, cls.modified_at).filter_by(user_id=user_id, resource=resource).first()
+        return tuple(row) if row else (0, None)
+
 class Conversation(db.Model):
+    __table_args__ = (
+        # Serves per-user history pages ordered by (timestamp, id)
+        db.Index('ix_conversation_user_timestamp', 'user_id', 'timestamp', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     message_text = db.Column(db.Text, nullable=False)
-    message_type = db.Column(db.String(20), nullable=False)  # user/ai/system
+    message_type = db.Column(db.String(20), nullable=False)  # user/ai/system/checkin
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     mood_score = db.Column(db.Integer)  # 1-10 scale
     contains_concern = db.Column(db.Boolean, default=False)
@@ -64,25 +161,117 @@ class Conversation(db.Model):
             'contains_concern': self.contains_concern
         }
 
+class ConversationDailyStats(db.Model):
+    """Per-user, per-day, per-message-type conversation rollup
+    
+    Kept up to date in the same transaction as every Conversation insert
+    so summaries scale with the number of days rather than messages.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    message_type = db.Column(db.String(20), primary_key=True)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    mood_sum = db.Column(db.Integer, nullable=False, default=0)
+    mood_count = db.Column(db.Integer, nullable=False, default=0)
+    concern_count = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def record(cls, conversations):
+        """Add new Conversation rows to the rollup within the current session"""
+        deltas = {}
+        for conv in conversations:
+            if conv.timestamp is None:
+                conv.timestamp = datetime.utcnow()
+            key = (conv.user_id, conv.timestamp.date(), conv.message_type)
+            delta = deltas.setdefault(key, [0, 0, 0, 0])
+            delta[0] += 1
+            if conv.mood_score is not None:
+                delta[1] += conv.mood_score
+                delta[2] += 1
+            if conv.contains_concern:
+                delta[3] += 1
+        
+        if not deltas:
+            return
+        
+        rows = [
+            {
+                'user_id': user_id,
+                'day': day,
+                'message_type': message_type,
+                'message_count': delta[0],
+                'mood_sum': delta[1],
+                'mood_count': delta[2],
+                'concern_count': delta[3]
+            }
+            for (user_id, day, message_type), delta in deltas.items()
+        ]
+        upsert_increment(
+            cls, rows,
+            ['user_id', 'day', 'message_type'],
+            ['message_count', 'mood_sum', 'mood_count', 'concern_count']
+        )
+
+    @classmethod
+    def rebuild(cls, user_id=None):
+        """Recompute the rollup from the Conversation table"""
+        day = func.date(Conversation.timestamp)
+        source = db.select(
+            Conversation.user_id,
+            day,
+            Conversation.message_type,
+            func.count(),
+            func.coalesce(func.sum(Conversation.mood_score), 0),
+            func.count(Conversation.mood_score),
+            func.sum(case((Conversation.contains_concern == True, 1), else_=0))
+        ).where(Conversation.timestamp.isnot(None))
+        
+        delete = db.delete(cls)
+        if user_id is not None:
+            source = source.where(Conversation.user_id == user_id)
+            delete = delete.where(cls.user_id == user_id)
+        source = source.group_by(Conversation.user_id, day, Conversation.message_type)
+        
+        db.session.execute(delete)
+        db.session.execute(db.insert(cls).from_select(
+            ['user_id', 'day', 'message_type', 'message_count', 'mood_sum', 'mood_count', 'concern_count'],
+            source
+        ))
+
+    @classmethod
+    def for_window(cls, user_id, start_day, end_day=None):
+        query = cls.query.filter(cls.user_id == user_id, cls.day >= start_day)
+        if end_day is not None:
+            query = query.filter(cls.day <= end_day)
+        return query.order_by(cls.day).all()
+
 class Medication(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     medication_name = db.Column(db.String(100), nullable=False)
     dosage = db.Column(db.String(50), nullable=False)
     frequency = db.Column(db.String(50), nullable=False)
-    time_slots = db.Column(db.Text)  # JSON array of times
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date)
     is_active = db.Column(db.Boolean, default=True)
     
     # Relationship
     logs = db.relationship('MedicationLog', backref='medication', lazy=True)
+    # Loaded with one extra query per batch of medications, never per row
+    slots = db.relationship(
+        'MedicationTimeSlot', lazy='selectin', cascade='all, delete-orphan',
+        order_by='MedicationTimeSlot.time_of_day'
+    )
 
     def get_time_slots(self):
-        return json.loads(self.time_slots) if self.time_slots else []
+        return [slot.to_value() for slot in self.slots]
 
     def set_time_slots(self, slots):
-        self.time_slots = json.dumps(slots)
+        """Replace the schedule; entries are "HH:MM" or {"time": "HH:MM", "days": ["mon", ...]}"""
+        self.slots = [
+            MedicationTimeSlot(time_of_day=time_of_day, days_mask=days_mask)
+            for time_of_day, days_mask in sorted(MedicationTimeSlot.parse_all(slots).items())
+        ]
 
     def to_dict(self):
         return {
@@ -97,7 +286,112 @@ class Medication(db.Model):
             'is_active': self.is_active
         }
 
+class MedicationTimeSlot(db.Model):
+    """One daily dose time of a medication, optionally limited to some weekdays
+    
+    days_mask has bit 0 for Monday through bit 6 for Sunday. The time_of_day
+    index lets "what is due between 08:00 and 09:00" be a range scan.
+    """
+    __table_args__ = (
+        db.Index('ix_medication_time_slot_time', 'time_of_day', 'medication_id'),
+    )
+
+    WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+    ALL_DAYS = 0b1111111
+    TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})(?::(\d{2}))?')
+
+    medication_id = db.Column(db.Integer, db.ForeignKey('medication.id'), primary_key=True)
+    time_of_day = db.Column(db.Time, primary_key=True)
+    days_mask = db.Column(db.Integer, nullable=False, default=ALL_DAYS)
+
+    @classmethod
+    def parse(cls, value):
+        """(time_of_day, days_mask) from "HH:MM" or {"time": "HH:MM", "days": [...]}; raises ValueError
+        
+        Times may also be "H:MM" or carry seconds ("HH:MM:SS"), as the legacy
+        JSON column accepted.
+        """
+        days = None
+        if isinstance(value, dict):
+            value, days = value.get('time'), value.get('days')
+        match = cls.TIME_PATTERN.fullmatch(value.strip()) if isinstance(value, str) else None
+        if not match:
+            raise ValueError(f'time slots must be "HH:MM" or "HH:MM:SS" strings, got {value!r}')
+        hour, minute, second = (int(part or 0) for part in match.groups())
+        if hour > 23 or minute > 59 or second > 59:
+            raise ValueError(f'time slot {value!r} is not a valid time of day')
+        time_of_day = time(hour, minute, second)
+        if days is None:
+            return time_of_day, cls.ALL_DAYS
+        try:
+            days_mask = sum(1 << cls.WEEKDAYS.index(str(day).lower()[:3]) for day in set(days))
+        except ValueError:
+            raise ValueError(f'days must be weekday names ({", ".join(cls.WEEKDAYS)})')
+        if not days_mask:
+            raise ValueError('days must not be empty')
+        return time_of_day, days_mask
+
+    @classmethod
+    def parse_all(cls, values):
+        """{time_of_day: days_mask} for a list of slots, merging repeated times"""
+        if not isinstance(values, list):
+            raise ValueError('time_slots must be a list')
+        slots = {}
+        for value in values:
+            time_of_day, days_mask = cls.parse(value)
+            slots[time_of_day] = slots.get(time_of_day, 0) | days_mask
+        return slots
+
+    @classmethod
+    def format(cls, time_of_day, days_mask):
+        """The set_time_slots value for a slot, "HH:MM" when it applies every day"""
+        value = time_of_day.strftime('%H:%M:%S' if time_of_day.second else '%H:%M')
+        if days_mask == cls.ALL_DAYS:
+            return value
+        return {'time': value, 'days': [day for bit, day in enumerate(cls.WEEKDAYS) if days_mask & (1 << bit)]}
+
+    @classmethod
+    def for_medications(cls, medication_ids):
+        """{medication_id: [formatted slots]} with one query per 1000 medications"""
+        slots = {}
+        medication_ids = list(medication_ids)
+        # Chunk the IN (...) list to stay under database parameter limits
+        for offset in range(0, len(medication_ids), 1000):
+            rows = db.session.query(cls.medication_id, cls.time_of_day, cls.days_mask)\
+                .filter(cls.medication_id.in_(medication_ids[offset:offset + 1000]))\
+                .order_by(cls.medication_id, cls.time_of_day)
+            for medication_id, time_of_day, days_mask in rows:
+                slots.setdefault(medication_id, []).append(cls.format(time_of_day, days_mask))
+        return slots
+
+    @classmethod
+    def medications_due_between(cls, start, end):
+        """Ids of active medications with a slot in [start, end) time of day, wrapping past midnight"""
+        if start <= end:
+            window = db.and_(cls.time_of_day >= start, cls.time_of_day < end)
+        else:
+            window = or_(cls.time_of_day >= start, cls.time_of_day < end)
+        return db.session.scalars(
+            db.select(cls.medication_id).distinct()
+            .join(Medication, Medication.id == cls.medication_id)
+            .where(window, Medication.is_active == True)
+        ).all()
+
+    def to_value(self):
+        return self.format(self.time_of_day, self.days_mask)
+
 class MedicationLog(db.Model):
+    __table_args__ = (
+        # Serves compliance aggregates over a user's scheduling window
+        db.Index('ix_medication_log_user_scheduled_status', 'user_id', 'scheduled_time', 'status'),
+        # At most one auto-missed log per dose, however many mark-missed runs overlap
+        db.Index(
+            'ux_medication_log_auto_dose', 'medication_id', 'scheduled_time', unique=True,
+            sqlite_where=db.text("confirmation_method = 'auto'"),
+            postgresql_where=db.text("confirmation_method = 'auto'")
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     medication_id = db.Column(db.Integer, db.ForeignKey('medication.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -117,7 +411,108 @@ class MedicationLog(db.Model):
             'confirmation_method': self.confirmation_method
         }
 
+    @classmethod
+    def insert_missed(cls, rows):
+        """Insert auto-missed log rows, skipping doses that already have one
+        
+        Returns the (medication_id, scheduled_time) of the rows inserted.
+        """
+        insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+        stmt = insert(cls.__table__).on_conflict_do_nothing(
+            index_elements=['medication_id', 'scheduled_time'],
+            index_where=cls.confirmation_method == 'auto'
+        ).returning(cls.medication_id, cls.scheduled_time)
+        return {tuple(row) for row in db.session.execute(stmt, rows)}
+
+    @classmethod
+    def remove_duplicate_auto_logs(cls):
+        """Delete all but the first auto-missed log of each dose; returns how many were deleted"""
+        first = db.select(func.min(cls.id)).where(cls.confirmation_method == 'auto')\
+            .group_by(cls.medication_id, cls.scheduled_time)
+        return db.session.execute(
+            db.delete(cls).where(cls.confirmation_method == 'auto', cls.id.not_in(first))
+        ).rowcount
+
+class MedicationAdherenceStats(db.Model):
+    """Per-user, per-medication dose log rollup by day and scheduled hour
+    
+    Kept up to date on the dose log write path so adherence breakdowns
+    never need the raw logs.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    medication_id = db.Column(db.Integer, db.ForeignKey('medication.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    hour = db.Column(db.Integer, primary_key=True)
+    log_count = db.Column(db.Integer, nullable=False, default=0)
+    taken_count = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def record(cls, logs, removed=()):
+        """Add new MedicationLog rows to the rollup within the current session
+        
+        Logs in removed (deleted rows being replaced) are taken back out.
+        """
+        deltas = {}
+        for sign, group in ((1, logs), (-1, removed)):
+            for log in group:
+                key = (log.user_id, log.medication_id, log.scheduled_time.date(), log.scheduled_time.hour)
+                delta = deltas.setdefault(key, [0, 0])
+                delta[0] += sign
+                if log.status == 'taken':
+                    delta[1] += sign
+        
+        if not deltas:
+            return
+        
+        rows = [
+            {
+                'user_id': user_id,
+                'medication_id': medication_id,
+                'day': day,
+                'hour': hour,
+                'log_count': delta[0],
+                'taken_count': delta[1]
+            }
+            for (user_id, medication_id, day, hour), delta in deltas.items()
+        ]
+        upsert_increment(
+            cls, rows,
+            ['user_id', 'medication_id', 'day', 'hour'],
+            ['log_count', 'taken_count']
+        )
+
+    @classmethod
+    def rebuild(cls, user_id=None):
+        """Recompute the rollup from the MedicationLog table"""
+        day = func.date(MedicationLog.scheduled_time)
+        hour = db.extract('hour', MedicationLog.scheduled_time)
+        source = db.select(
+            MedicationLog.user_id,
+            MedicationLog.medication_id,
+            day,
+            hour,
+            func.count(),
+            func.sum(case((MedicationLog.status == 'taken', 1), else_=0))
+        )
+        
+        delete = db.delete(cls)
+        if user_id is not None:
+            source = source.where(MedicationLog.user_id == user_id)
+            delete = delete.where(cls.user_id == user_id)
+        source = source.group_by(MedicationLog.user_id, MedicationLog.medication_id, day, hour)
+        
+        db.session.execute(delete)
+        db.session.execute(db.insert(cls).from_select(
+            ['user_id', 'medication_id', 'day', 'hour', 'log_count', 'taken_count'],
+            source
+        ))
+
 class Appointment(db.Model):
+    __table_args__ = (
+        # Serves the reminder window and upcoming-appointment scans
+        db.Index('ix_appointment_date_status', 'appointment_date', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -197,3 +592,165 @@ class CaregiverReport(db.Model):
             'ai_insights': self.get_ai_insights()
         }
 
+class Alert(db.Model):
+    """Caregiver alert, materialized when the triggering row is written
+    
+    Alerts are deduplicated per elder and `dedup_key`: while an alert is
+    open, further occurrences only bump `occurrences` and `last_seen_at`.
+    """
+    __table_args__ = (
+        db.Index('ix_alert_elder_status', 'elder_id', 'status', 'last_seen_at'),
+        db.Index('ix_alert_elder_key', 'elder_id', 'dedup_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    elder_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    alert_type = db.Column(db.String(20), nullable=False)  # medication/conversation/mood/appointment
+    severity = db.Column(db.String(20), nullable=False)  # low/medium/high
+    message = db.Column(db.Text, nullable=False)
+    dedup_key = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='open')  # open/acknowledged/resolved
+    occurrences = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    acknowledged_at = db.Column(db.DateTime)
+    acknowledged_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'elder_id': self.elder_id,
+            'type': self.alert_type,
+            'severity': self.severity,
+            'message': self.message,
+            'status': self.status,
+            'occurrences': self.occurrences,
+            'timestamp': self.last_seen_at.isoformat(),
+            'created_at': self.created_at.isoformat(),
+            'acknowledged_at': self.acknowledged_at.isoformat() if self.acknowledged_at else None
+        }
+
+    @classmethod
+    def raise_many(cls, candidates):
+        """Open or refresh alerts for a list of candidate dicts; returns the alerts touched
+        
+        Each candidate holds elder_id, alert_type, severity, message and
+        dedup_key. Keys acknowledged within ALERT_COOLDOWN are suppressed.
+        """
+        if not candidates:
+            return []
+        
+        now = datetime.utcnow()
+        existing = cls.query.filter(
+            cls.elder_id.in_({c['elder_id'] for c in candidates}),
+            cls.dedup_key.in_({c['dedup_key'] for c in candidates}),
+            or_(cls.status == 'open', cls.acknowledged_at >= now - ALERT_COOLDOWN)
+        ).all()
+        latest = {}
+        for alert in existing:
+            key = (alert.elder_id, alert.dedup_key)
+            if key not in latest or alert.status == 'open':
+                latest[key] = alert
+        
+        touched = []
+        for candidate in candidates:
+            key = (candidate['elder_id'], candidate['dedup_key'])
+            alert = latest.get(key)
+            if alert is None:
+                alert = cls(created_at=now, last_seen_at=now, occurrences=1, status='open', **candidate)
+                db.session.add(alert)
+                latest[key] = alert
+            elif alert.status == 'open':
+                alert.occurrences += 1
+                alert.message = candidate['message']
+                alert.last_seen_at = now
+            else:
+                continue
+            if alert not in touched:
+                touched.append(alert)
+        return touched
+
+    @classmethod
+    def resolve(cls, elder_id, dedup_key):
+        """Close open alerts whose condition no longer holds; returns the alerts closed"""
+        alerts = cls.query.filter_by(elder_id=elder_id, dedup_key=dedup_key, status='open').all()
+        for alert in alerts:
+            alert.status = 'resolved'
+        return alerts
+
+    @classmethod
+    def evaluate_conversations(cls, conversations):
+        """Alert on concern-flagged or low-mood messages (AI replies echo the flags and are skipped)"""
+        candidates = []
+        for conv in conversations:
+            if conv.message_type == 'ai':
+                continue
+            if conv.contains_concern:
+                candidates.append({
+                    'elder_id': conv.user_id,
+                    'alert_type': 'conversation',
+                    'severity': 'medium',
+                    'message': f'Concerning conversation detected: {conv.message_text[:100]}...',
+                    'dedup_key': 'conversation'
+                })
+            if conv.mood_score is not None and conv.mood_score <= LOW_MOOD_THRESHOLD:
+                candidates.append({
+                    'elder_id': conv.user_id,
+                    'alert_type': 'mood',
+                    'severity': 'medium',
+                    'message': 'Low mood detected in recent conversations',
+                    'dedup_key': 'mood'
+                })
+        return cls.raise_many(candidates)
+
+    @classmethod
+    def evaluate_medication_logs(cls, logs):
+        """Alert on missed doses, escalating once more than two are outstanding"""
+        alerts = cls.raise_many([
+            {
+                'elder_id': log.user_id,
+                'alert_type': 'medication',
+                'severity': 'medium',
+                'message': '1 missed medication(s)',
+                'dedup_key': 'medication'
+            }
+            for log in logs if log.status == 'missed'
+        ])
+        for alert in alerts:
+            alert.severity = 'high' if alert.occurrences > 2 else 'medium'
+            alert.message = f'{alert.occurrences} missed medication(s)'
+        return alerts
+
+    @classmethod
+    def evaluate_appointment(cls, appointment, deleted=False):
+        """Alert while an appointment is tomorrow without a reminder; resolve otherwise"""
+        dedup_key = f'appointment:{appointment.id}'
+        needs_reminder = (
+            not deleted
+            and appointment.status == 'scheduled'
+            and appointment.appointment_date == date.today() + timedelta(days=1)
+            and not appointment.reminder_sent
+        )
+        if not needs_reminder:
+            return cls.resolve(appointment.user_id, dedup_key)
+        return cls.raise_many([cls.appointment_candidate(appointment)])
+
+    @classmethod
+    def evaluate_upcoming_appointments(cls):
+        """Raise appointment alerts for tomorrow; run daily since dates roll over without a write"""
+        appointments = Appointment.query.filter(
+            Appointment.appointment_date == date.today() + timedelta(days=1),
+            Appointment.status == 'scheduled',
+            Appointment.reminder_sent == False
+        ).all()
+        return cls.raise_many([cls.appointment_candidate(apt) for apt in appointments])
+
+    @staticmethod
+    def appointment_candidate(appointment):
+        return {
+            'elder_id': appointment.user_id,
+            'alert_type': 'appointment',
+            'severity': 'low',
+            'message': f'Reminder needed for appointment: {appointment.title}',
+            'dedup_key': f'appointment:{appointment.id}'
+        }